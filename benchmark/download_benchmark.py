@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# Drives VodDownloader, Recorder and Playlist against the local stand-in
+# and reports throughput, requests per segment, segment latency, peak RSS and
+# how many AsyncContents connections were opened and reused.
+# Every scenario runs in a fresh process with its own cache and config directories,
+# so peak RSS is the scenario's own and no cached tokens or links carry over.
+# Run from the repository root: python3 -m benchmark.download_benchmark [scenario ...] [options]
+import asyncio
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmark.standin import StandIn, point_twitch_at
+
+VOD_ID = 1000
+LIVE_CHANNEL = 'standin'
+POLLED_CHANNEL = 'standin-polled'
+
+
+def parse_args():
+    parser = ArgumentParser(description='Benchmarks the download paths against a local Twitch stand-in')
+    parser.add_argument('scenario', nargs='*', help='any of {} (defaults to all)'.format(', '.join(SCENARIOS)))
+    parser.add_argument('--segment-size', type=int, default=1024 * 1024, help='bytes per segment')
+    parser.add_argument('--vod-segments', type=int, default=200)
+    parser.add_argument('--live-segments', type=int, default=20)
+    parser.add_argument('--live-segment-duration', type=float, default=0.5, help='seconds')
+    parser.add_argument('--polls', type=int, default=200, help='live playlist fetches in the playlist scenario')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds before every response')
+    parser.add_argument('--bandwidth', type=int, default=None, help='bytes per second per response')
+    parser.add_argument('--min-concurrency', type=int, default=2)
+    parser.add_argument('--max-concurrency', type=int, default=16)
+    args = parser.parse_args()
+    unknown = set(args.scenario) - set(SCENARIOS)
+    if unknown:
+        parser.error('unknown scenarios: ' + ', '.join(sorted(unknown)))
+    args.scenario = args.scenario or list(SCENARIOS)
+    return args
+
+
+def isolate(url, home):
+    os.environ['HOME'] = home
+    os.environ['XDG_CACHE_HOME'] = os.path.join(home, 'cache')
+    os.environ['XDG_CONFIG_HOME'] = os.path.join(home, 'config')
+    os.makedirs(os.path.join(home, 'config', 'tw-dl'))
+    with open(os.path.join(home, 'config', 'tw-dl', 'credentials'), 'w') as credentials:
+        credentials.write('standin-client\nstandin-secret\n')
+    os.chdir(home)
+    # progress bars and log lines would drown the report
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    point_twitch_at(url)
+
+
+def peak_rss_bytes():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# the scenarios run in the spawned processes, each returns (bytes, segments)
+
+def download_vod(args):
+    from twitch.playlist import Playlist
+    from twitch.vod_downloader import VodDownloader
+    from twitch.vod_journal import VodJournal
+    from util.concurrency_controller import ConcurrencyController
+    from util.file import File
+
+    playlist = Playlist().fetch_vod_playlist(VOD_ID)
+    segments = playlist.uris_between(0, sys.maxsize)
+    file_name = 'vod.ts'
+    open(file_name, 'w').close()
+    journal = VodJournal(VOD_ID, 0, sys.maxsize)
+    journal.start(file_name, len(segments))
+    downloader = VodDownloader(
+        segments,
+        journal,
+        ConcurrencyController(args.min_concurrency, args.max_concurrency)
+    )
+    asyncio.run(downloader.download_to(file_name))
+    return File.size(file_name), len(segments)
+
+
+def record_live(args):
+    from twitch.recorder import Recorder
+
+    asyncio.run(Recorder().record(LIVE_CHANNEL))
+    size = sum(os.path.getsize(name) for name in os.listdir('.') if name.endswith('.ts'))
+    return size, size // args.segment_size
+
+
+def poll_playlist(args):
+    from twitch.playlist import Playlist
+    from util.asynccontents import AsyncContents
+
+    async def poll():
+        playlist = Playlist()
+        last_sequence = None
+        async with AsyncContents():
+            for _ in range(args.polls):
+                live_playlist = await playlist.fetch_live_for_channel_async(POLLED_CHANNEL, last_sequence)
+                if live_playlist is not None and live_playlist.segment_count != 0:
+                    last_sequence = live_playlist.last_sequence()
+
+    asyncio.run(poll())
+    return 0, args.polls
+
+
+SCENARIOS = {
+    'vod': download_vod,
+    'live': record_live,
+    'playlist': poll_playlist,
+}
+
+
+def run_scenario(name, url, args):
+    from util.asynccontents import AsyncContents
+
+    with tempfile.TemporaryDirectory(prefix='twitch-dl-benchmark-') as home:
+        isolate(url, home)
+        started_at = time.perf_counter()
+        size, segments = SCENARIOS[name](args)
+        seconds = time.perf_counter() - started_at
+        return seconds, size, segments, peak_rss_bytes(), AsyncContents().connection_stats()
+
+
+def percentile(values, fraction):
+    if len(values) == 0:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[round(fraction * (len(ordered) - 1))]
+
+
+async def benchmark(args):
+    spawn = multiprocessing.get_context('spawn')
+    loop = asyncio.get_event_loop()
+    async with StandIn(
+            segment_size=args.segment_size,
+            vod_segments=args.vod_segments,
+            live_segment_duration=args.live_segment_duration,
+            live_segments=args.live_segments,
+            latency=args.latency,
+            bandwidth=args.bandwidth
+    ) as standin:
+        print('{:<10}{:>10}{:>10}{:>10}{:>14}{:>10}{:>10}{:>10}{:>10}{:>10}'.format(
+            'scenario', 'seconds', 'MB', 'MB/s', 'requests/seg', 'p50 ms', 'p99 ms', 'RSS MB', 'conns', 'reused'))
+        for name in args.scenario:
+            standin.reset_stats()
+            with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+                seconds, size, segments, rss, (created, reused) = await loop.run_in_executor(
+                    executor, run_scenario, name, standin.url, args)
+            requests = sum(standin.requests.values())
+            print('{:<10}{:>10.2f}{:>10.1f}{:>10.1f}{:>14.2f}{:>10.1f}{:>10.1f}{:>10.1f}{:>10}{:>10}'.format(
+                name,
+                seconds,
+                size / 2 ** 20,
+                size / 2 ** 20 / seconds,
+                requests / max(segments, 1),
+                percentile(standin.segment_seconds, 0.5) * 1000,
+                percentile(standin.segment_seconds, 0.99) * 1000,
+                rss / 2 ** 20,
+                created,
+                reused,
+            ))
+        print()
+        print('requests/seg counts every request, for playlist it is requests per poll.')
+        print('Segment latency is measured by the stand-in, from request to the last byte sent.')
+        print('conns and reused count AsyncContents connections.')
+
+
+def main():
+    asyncio.run(benchmark(parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,388 @@
+# A local stand-in for the Twitch endpoints twitch-dl talks to: usher playlists,
+# playlist access tokens, the OAuth token endpoint and the Helix lookups.
+# VODs and live streams are synthetic, every segment's bytes are derived from its
+# stream and index, so downloads can be checked byte by byte.
+# Faults the real endpoints show now and then can be injected on purpose, see Faults.
+#
+#   async with StandIn(segment_size=512 * 1024) as standin:
+#       point_twitch_at(standin.url)
+#       ...
+#
+# Run on its own to poke at it: python3 -m benchmark.standin [--port PORT]
+import asyncio
+import json
+import random
+import time
+from argparse import ArgumentParser
+from collections import Counter
+
+from aiohttp import web
+
+from twitch.constants import Twitch
+
+VOD_PATH = '/vods/{}/chunked'
+LIVE_PATH = '/live/{}'
+
+
+# Chances are per request, bursts and empty playlists start every that many requests.
+# Segments listed in broken_segments are always answered with 503. Playlist tokens and the media playlist links signed with them
+# are rejected with 403 once token_ttl seconds passed. App access tokens still claim to last an hour,
+# but Helix rejects them with 401 once app_token_ttl seconds passed, as if they got revoked.
+class Faults:
+    def __init__(self, head_bad_request=0.0, reset=0.0, stall=0.0, stall_seconds=5.0,
+                 error_burst_every=0, error_burst_length=3, token_ttl=None, app_token_ttl=None,
+                 empty_playlist_every=0, empty_playlist_length=2, broken_segments=(), seed=0):
+        self.head_bad_request = head_bad_request
+        self.reset = reset
+        self.stall = stall
+        self.stall_seconds = stall_seconds
+        self.error_burst_every = error_burst_every
+        self.error_burst_length = error_burst_length
+        self.token_ttl = token_ttl
+        self.app_token_ttl = app_token_ttl
+        self.empty_playlist_every = empty_playlist_every
+        self.empty_playlist_length = empty_playlist_length
+        self.broken_segments = set(broken_segments)
+        self.seed = seed
+
+
+class StandIn:
+    __write_chunk_size = 64 * 1024
+    __token_ttl = 3600
+
+    def __init__(self, segment_size=256 * 1024, segment_duration=10.0, vod_segments=100,
+                 muted_every=0, live_segment_duration=2.0, live_segments=30, live_window=6,
+                 latency=0.0, bandwidth=None, faults=None, unknown_keys=(), port=0):
+        self.segment_size = segment_size
+        self.segment_duration = segment_duration
+        self.vod_segments = vod_segments
+        self.muted_every = muted_every
+        self.live_segment_duration = live_segment_duration
+        self.live_segments = live_segments
+        self.live_window = live_window
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.faults = faults or Faults()
+        # logins and video ids the Helix lookups find nothing for
+        self.unknown_keys = set(unknown_keys)
+        self.url = None
+        self.requests = Counter()
+        self.segment_requests = Counter()
+        self.segment_seconds = []
+        self.injected = Counter()
+        self.__random = random.Random(self.faults.seed)
+        self.__error_burst_left = 0
+        self.__empty_playlists_left = 0
+        self.__port = port
+        self.__runner = None
+        self.__live_started_at = {}
+        self.__app_tokens_minted_at = {}
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    async def start(self):
+        app = web.Application()
+        app.add_routes([
+            web.get('/api/vods/{vod_id}/access_token', self.__access_token),
+            web.get('/api/channels/{channel}/access_token', self.__access_token),
+            web.get('/usher/vod/{vod_id}', self.__vod_master_playlist),
+            web.get('/api/channel/hls/{channel}.m3u8', self.__live_master_playlist),
+            web.get(VOD_PATH.format('{vod_id}') + '/index-dvr.m3u8', self.__vod_playlist),
+            web.get(VOD_PATH.format('{vod_id}') + '/{index:\\d+}{muted:(-muted)?}.ts', self.__vod_segment),
+            web.get(LIVE_PATH.format('{channel}') + '/index.m3u8', self.__live_playlist),
+            web.get(LIVE_PATH.format('{channel}') + '/{index:\\d+}.ts', self.__live_segment),
+            web.post('/oauth2/token', self.__auth_token),
+            web.get('/helix/streams', self.__streams),
+            web.get('/helix/users', self.__users),
+            web.get('/helix/videos', self.__videos),
+        ])
+        self.__runner = web.AppRunner(app)
+        await self.__runner.setup()
+        site = web.TCPSite(self.__runner, '127.0.0.1', self.__port)
+        await site.start()
+        host, port = self.__runner.addresses[0][:2]
+        self.url = f'http://{host}:{port}'
+
+    async def stop(self):
+        await self.__runner.cleanup()
+
+    def reset_stats(self):
+        self.requests.clear()
+        self.segment_requests.clear()
+        self.segment_seconds.clear()
+        self.injected.clear()
+
+    def segment_data(self, stream, index):
+        pattern = f'{stream}/{index};'.encode()
+        return (pattern * (self.segment_size // len(pattern) + 1))[:self.segment_size]
+
+    def vod_data(self, vod_id, first_index=0, last_index=None):
+        last_index = self.vod_segments - 1 if last_index is None else last_index
+        return b''.join(
+            self.segment_data(f'vod-{vod_id}', index) for index in range(first_index, last_index + 1)
+        )
+
+    def live_data(self, channel, sequences):
+        return b''.join(self.segment_data(f'live-{channel}', sequence) for sequence in sequences)
+
+    def is_muted(self, index):
+        return self.muted_every != 0 and index % self.muted_every == 0
+
+    async def __access_token(self, request):
+        self.requests['token'] += 1
+        await self.__delay()
+        return web.json_response({
+            'token': json.dumps({'expires': time.time() + (self.faults.token_ttl or self.__token_ttl)}),
+            'sig': 'standin',
+        })
+
+    def __check_token(self, request):
+        try:
+            expires = json.loads(request.query['token'])['expires']
+        except (KeyError, ValueError):
+            raise web.HTTPForbidden()
+        if expires < time.time():
+            self.injected['expired token'] += 1
+            raise web.HTTPForbidden()
+        return expires
+
+    async def __vod_master_playlist(self, request):
+        self.requests['master playlist'] += 1
+        await self.__delay()
+        self.__check_token(request)
+        link = self.url + VOD_PATH.format(request.match_info['vod_id']) + '/index-dvr.m3u8'
+        return self.__master_playlist_response(link)
+
+    async def __live_master_playlist(self, request):
+        self.requests['master playlist'] += 1
+        await self.__delay()
+        expires = self.__check_token(request)
+        channel = request.match_info['channel']
+        self.__live_started_at.setdefault(channel, time.time())
+        if self.__live_produced(channel) is None:
+            raise web.HTTPNotFound()
+        link = self.url + LIVE_PATH.format(channel) + f'/index.m3u8?expires={expires}'
+        return self.__master_playlist_response(link)
+
+    @staticmethod
+    def __master_playlist_response(link):
+        return web.Response(text='\n'.join([
+            '#EXTM3U',
+            '#EXT-X-STREAM-INF:BANDWIDTH=8000000,RESOLUTION=1920x1080,VIDEO="chunked"',
+            link,
+        ]) + '\n')
+
+    async def __vod_playlist(self, request):
+        self.requests['media playlist'] += 1
+        await self.__delay()
+        lines = [
+            '#EXTM3U',
+            '#EXT-X-VERSION:3',
+            f'#EXT-X-TARGETDURATION:{int(self.segment_duration)}',
+            '#EXT-X-PLAYLIST-TYPE:EVENT',
+            '#EXT-X-MEDIA-SEQUENCE:0',
+        ]
+        for index in range(self.vod_segments):
+            lines.append(f'#EXTINF:{self.segment_duration:.3f},')
+            lines.append('{}{}.ts'.format(index, '-muted' if self.is_muted(index) else ''))
+        lines.append('#EXT-X-ENDLIST')
+        return web.Response(text='\n'.join(lines) + '\n')
+
+    # the stream produces a segment every live_segment_duration seconds from the first
+    # master playlist request on, once all live_segments were produced the last window
+    # stays up for a window's duration before the channel goes offline
+    def __live_produced(self, channel):
+        elapsed = time.time() - self.__live_started_at.setdefault(channel, time.time())
+        produced = int(elapsed / self.live_segment_duration) + 1
+        if produced > self.live_segments + self.live_window:
+            return None
+        return min(produced, self.live_segments)
+
+    # live segment links are absolute like the ones Twitch hands out
+    async def __live_playlist(self, request):
+        self.requests['media playlist'] += 1
+        await self.__delay()
+        if 'expires' in request.query and float(request.query['expires']) < time.time():
+            self.injected['expired link'] += 1
+            raise web.HTTPForbidden()
+        channel = request.match_info['channel']
+        produced = self.__live_produced(channel)
+        if produced is None:
+            raise web.HTTPNotFound()
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{int(self.live_segment_duration + 0.999)}']
+        if self.__is_playlist_empty():
+            self.injected['empty playlist'] += 1
+            return web.Response(text='\n'.join(lines) + '\n')
+        first = max(0, produced - self.live_window)
+        lines.append(f'#EXT-X-MEDIA-SEQUENCE:{first}')
+        for sequence in range(first, produced):
+            lines.append(f'#EXTINF:{self.live_segment_duration:.3f},live')
+            lines.append(self.url + LIVE_PATH.format(channel) + f'/{sequence}.ts')
+        return web.Response(text='\n'.join(lines) + '\n')
+
+    def __is_playlist_empty(self):
+        every = self.faults.empty_playlist_every
+        if every and self.__empty_playlists_left == 0 and self.requests['media playlist'] % every == 0:
+            self.__empty_playlists_left = self.faults.empty_playlist_length
+        if self.__empty_playlists_left == 0:
+            return False
+        self.__empty_playlists_left -= 1
+        return True
+
+    async def __vod_segment(self, request):
+        vod_id = request.match_info['vod_id']
+        index = int(request.match_info['index'])
+        if index >= self.vod_segments:
+            raise web.HTTPNotFound()
+        return await self.__segment(request, self.segment_data(f'vod-{vod_id}', index), index)
+
+    async def __live_segment(self, request):
+        channel = request.match_info['channel']
+        index = int(request.match_info['index'])
+        return await self.__segment(request, self.segment_data(f'live-{channel}', index), index)
+
+    async def __segment(self, request, data, index):
+        started_at = time.perf_counter()
+        self.requests['segment'] += 1
+        self.segment_requests[request.path] += 1
+        await self.__delay()
+        if request.method == 'HEAD' and self.__chance(self.faults.head_bad_request):
+            self.injected['bad request'] += 1
+            raise web.HTTPBadRequest()
+        if index in self.faults.broken_segments or self.__is_in_error_burst():
+            self.injected['server error'] += 1
+            raise web.HTTPServiceUnavailable()
+        response = web.StreamResponse(headers={'Content-Type': 'video/MP2T'})
+        response.content_length = len(data)
+        await response.prepare(request)
+        if request.method != 'HEAD':
+            if self.__chance(self.faults.reset):
+                self.injected['reset'] += 1
+                await self.__write_throttled(response, data[:len(data) // 2])
+                request.transport.abort()
+                return response
+            if self.__chance(self.faults.stall):
+                self.injected['stall'] += 1
+                await self.__write_throttled(response, data[:len(data) // 2])
+                await asyncio.sleep(self.faults.stall_seconds)
+                request.transport.abort()
+                return response
+            await self.__write_throttled(response, data)
+        await response.write_eof()
+        self.segment_seconds.append(time.perf_counter() - started_at)
+        return response
+
+    def __chance(self, probability):
+        return probability != 0 and self.__random.random() < probability
+
+    def __is_in_error_burst(self):
+        every = self.faults.error_burst_every
+        if every and self.__error_burst_left == 0 and self.requests['segment'] % every == 0:
+            self.__error_burst_left = self.faults.error_burst_length
+        if self.__error_burst_left == 0:
+            return False
+        self.__error_burst_left -= 1
+        return True
+
+    async def __write_throttled(self, response, data):
+        for offset in range(0, len(data), self.__write_chunk_size):
+            chunk = data[offset:offset + self.__write_chunk_size]
+            await response.write(chunk)
+            if self.bandwidth:
+                await asyncio.sleep(len(chunk) / self.bandwidth)
+
+    async def __auth_token(self, request):
+        self.requests['auth'] += 1
+        await self.__delay()
+        access_token = 'standin-{}'.format(len(self.__app_tokens_minted_at))
+        self.__app_tokens_minted_at[access_token] = time.time()
+        return web.json_response({'access_token': access_token, 'expires_in': 3600, 'token_type': 'bearer'})
+
+    def __check_app_token(self, request):
+        _, _, access_token = request.headers.get('Authorization', '').partition('Bearer ')
+        minted_at = self.__app_tokens_minted_at.get(access_token)
+        if minted_at is None:
+            raise web.HTTPUnauthorized()
+        if self.faults.app_token_ttl is not None and minted_at + self.faults.app_token_ttl < time.time():
+            self.injected['revoked app token'] += 1
+            raise web.HTTPUnauthorized()
+
+    async def __streams(self, request):
+        self.requests['helix'] += 1
+        await self.__delay()
+        self.__check_app_token(request)
+        channel = request.query.get('user_login', '')
+        return web.json_response({'data': [{'user_login': channel, 'title': f'{channel} stand-in stream'}]})
+
+    async def __users(self, request):
+        self.requests['helix'] += 1
+        await self.__delay()
+        self.__check_app_token(request)
+        return web.json_response({'data': [
+            {'id': str(1000 + index), 'login': login.lower()}
+            for index, login in enumerate(request.query.getall('login', []))
+            if login not in self.unknown_keys
+        ]})
+
+    async def __videos(self, request):
+        self.requests['helix'] += 1
+        await self.__delay()
+        self.__check_app_token(request)
+        return web.json_response({'data': [
+            {'id': video_id, 'title': f'vod {video_id}', 'created_at': '2020-01-01T00:00:00Z'}
+            for video_id in request.query.getall('id', [])
+            if video_id not in self.unknown_keys
+        ], 'pagination': {}})
+
+    async def __delay(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+
+def point_twitch_at(url):
+    Twitch.channel_playlist_link = url + '/api/channel/hls/{}.m3u8'
+    Twitch.vod_playlist_link = url + '/usher/vod/{}'
+    Twitch.channel_token_link = url + '/api/channels/{}/access_token'
+    Twitch.vod_token_link = url + '/api/vods/{}/access_token'
+    Twitch.stream_link = url + '/helix/streams'
+    Twitch.auth_token_url = url + '/oauth2/token?grant_type=client_credentials' \
+                                  '&client_id={client_id}&client_secret={client_secret}'
+    Twitch.users_url = url + '/helix/users'
+    Twitch.videos_url = url + '/helix/videos'
+
+
+async def serve(options):
+    async with StandIn(
+            segment_size=options.segment_size,
+            vod_segments=options.vod_segments,
+            live_segments=options.live_segments,
+            latency=options.latency,
+            bandwidth=options.bandwidth,
+            port=options.port
+    ) as standin:
+        print('Serving on ' + standin.url)
+        while True:
+            await asyncio.sleep(3600)
+
+
+def main():
+    parser = ArgumentParser(description='Serves synthetic Twitch VODs and live streams locally')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--segment-size', type=int, default=256 * 1024, help='bytes per segment')
+    parser.add_argument('--vod-segments', type=int, default=100)
+    parser.add_argument('--live-segments', type=int, default=30)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before every response')
+    parser.add_argument('--bandwidth', type=int, default=None, help='bytes per second per response')
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
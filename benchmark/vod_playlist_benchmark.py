@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# Compares the m3u8 based VOD playlist handling twitch-dl.py used before
+# with VodPlaylist on a synthetic playlist.
+# Run from the repository root: python3 -m benchmark.vod_playlist_benchmark [segment_count]
+import random
+import sys
+import time
+import tracemalloc
+
+import m3u8
+
+from twitch.vod_playlist import VodPlaylist
+
+BASE_PATH = 'https://vod-secure.twitch.tv/0123456789abcdef_channel_12345678901_1234567890/chunked'
+LOOKUPS = 100
+
+
+def synthetic_playlist(segment_count):
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:3',
+        '#EXT-X-TARGETDURATION:10',
+        '#EXT-X-PLAYLIST-TYPE:EVENT',
+        '#EXT-X-MEDIA-SEQUENCE:0',
+    ]
+    for index in range(segment_count):
+        lines.append('#EXTINF:10.000,')
+        lines.append('{}{}.ts'.format(index, '-muted' if index % 50 == 0 else ''))
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
+
+
+def random_ranges(duration):
+    generator = random.Random(0)
+    ranges = []
+    for _ in range(LOOKUPS):
+        start = generator.uniform(0, duration)
+        ranges.append((start, generator.uniform(start, duration) + 1))
+    return ranges
+
+
+class M3u8Path:
+    name = 'm3u8 + linear clip'
+
+    @staticmethod
+    def load(raw_playlist):
+        playlist = m3u8.loads(raw_playlist)
+        playlist.base_path = BASE_PATH
+        return playlist
+
+    @staticmethod
+    def uris_between(playlist, start_time, end_time):
+        start = 0
+        with_time = []
+        for segment in playlist.segments:
+            with_time.append((start, segment))
+            start += segment.duration
+        return [
+            s.uri for (start, s)
+            in with_time
+            if (start + s.duration) > start_time and start < end_time
+        ]
+
+
+class VodPlaylistPath:
+    name = 'VodPlaylist + bisect'
+
+    @staticmethod
+    def load(raw_playlist):
+        return VodPlaylist.parse(raw_playlist, BASE_PATH)
+
+    @staticmethod
+    def uris_between(playlist, start_time, end_time):
+        return list(playlist.uris_between(start_time, end_time))
+
+
+def measure(path, raw_playlist, ranges):
+    tracemalloc.start()
+    started = time.perf_counter()
+    playlist = path.load(raw_playlist)
+    load_seconds = time.perf_counter() - started
+    retained_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    started = time.perf_counter()
+    for start_time, end_time in ranges:
+        path.uris_between(playlist, start_time, end_time)
+    lookup_seconds = (time.perf_counter() - started) / len(ranges)
+    return load_seconds, retained_bytes, peak_bytes, lookup_seconds
+
+
+def main():
+    segment_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    raw_playlist = synthetic_playlist(segment_count)
+    ranges = random_ranges(segment_count * 10)
+    print('{} segments, {} range lookups'.format(segment_count, len(ranges)))
+    print('{:<24}{:>12}{:>14}{:>14}{:>14}'.format('', 'load ms', 'retained MB', 'peak MB', 'lookup ms'))
+    for path in [M3u8Path, VodPlaylistPath]:
+        load_seconds, retained_bytes, peak_bytes, lookup_seconds = measure(path, raw_playlist, ranges)
+        print('{:<24}{:>12.1f}{:>14.2f}{:>14.2f}{:>14.3f}'.format(
+            path.name,
+            load_seconds * 1000,
+            retained_bytes / 2 ** 20,
+            peak_bytes / 2 ** 20,
+            lookup_seconds * 1000,
+        ))
+
+
+if __name__ == '__main__':
+    main()
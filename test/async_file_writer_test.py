@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from util.async_file_writer import AsyncFileWriter
+
+
+pytestmark = pytest.mark.usefixtures('in_tmp_path')
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, 5))
+
+
+def test_writes_at_increasing_offsets(read):
+    written = []
+
+    async def write():
+        async with AsyncFileWriter('file', 3, 2) as writer:
+            for index in range(5):
+                await writer.write(bytes([65 + index]) * 4, written.append)
+
+    with open('file', 'wb') as file:
+        file.write(b'abc')
+    run(write())
+    assert read('file') == b'abcAAAABBBBCCCCDDDDEEEE'
+    assert written == [4] * 5
+
+
+def test_failing_callback_is_raised_instead_of_blocking_the_writer():
+    def on_written(size):
+        raise OSError('disk full')
+
+    async def write():
+        async with AsyncFileWriter('file', 0, 1) as writer:
+            for _ in range(10):
+                await writer.write(b'data', on_written)
+
+    with pytest.raises(OSError, match='disk full'):
+        run(write())
+
@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import pytest
+
+from benchmark.standin import Faults, StandIn, point_twitch_at
+from twitch.constants import Twitch
+from util.auth_header_provider import AuthHeaderProvider
+from util.contents import ContentError
+
+pytestmark = pytest.mark.usefixtures('isolated')
+
+
+# AuthHeaderProvider blocks, so it runs in the executor while the stand-in serves
+def run_against(standin, action):
+    async def run():
+        async with standin:
+            point_twitch_at(standin.url)
+            return await asyncio.get_event_loop().run_in_executor(None, action)
+
+    return asyncio.run(run())
+
+
+# a process started later only shares the on-disk cache
+def forget_token_in_memory(monkeypatch):
+    monkeypatch.setattr(AuthHeaderProvider, '_AuthHeaderProvider__token', None)
+    monkeypatch.setattr(AuthHeaderProvider, '_AuthHeaderProvider__resource', None)
+
+
+def lookup_user():
+    return AuthHeaderProvider.json(Twitch.users_url, params={'login': 'standin'})['data'][0]['id']
+
+
+def test_the_token_is_cached_on_disk_across_calls_and_processes(monkeypatch):
+    standin = StandIn()
+
+    def authenticate_twice_in_two_processes():
+        headers = [AuthHeaderProvider.authenticate(), AuthHeaderProvider.authenticate()]
+        forget_token_in_memory(monkeypatch)
+        return headers + [AuthHeaderProvider.authenticate()]
+
+    headers = run_against(standin, authenticate_twice_in_two_processes)
+    assert headers[0] == headers[1] == headers[2]
+    assert headers[0]['Client-ID'] == 'standin-client'
+    assert standin.requests['auth'] == 1
+
+
+def test_an_expired_token_is_replaced_by_a_new_one(monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr('util.auth_header_provider.time', lambda: now[0])
+    monkeypatch.setattr('util.persistent_resource.time', lambda: now[0])
+    standin = StandIn()
+
+    def authenticate_before_and_after_expiry():
+        first = AuthHeaderProvider.authenticate()
+        now[0] += 3600
+        return first, AuthHeaderProvider.authenticate()
+
+    first, second = run_against(standin, authenticate_before_and_after_expiry)
+    assert first['Authorization'] != second['Authorization']
+    assert standin.requests['auth'] == 2
+
+
+def test_a_token_of_another_client_is_not_reused(monkeypatch, isolated):
+    standin = StandIn()
+
+    def authenticate_before_and_after_changing_credentials():
+        first = AuthHeaderProvider.authenticate()
+        (isolated / 'config' / 'tw-dl' / 'credentials').write_text('other-client\nother-secret\n')
+        forget_token_in_memory(monkeypatch)
+        return first, AuthHeaderProvider.authenticate()
+
+    first, second = run_against(standin, authenticate_before_and_after_changing_credentials)
+    assert second['Client-ID'] == 'other-client'
+    assert first['Authorization'] != second['Authorization']
+    assert standin.requests['auth'] == 2
+
+
+def test_a_revoked_token_is_replaced_and_the_call_retried_once():
+    standin = StandIn(faults=Faults(app_token_ttl=0.3))
+
+    def look_up_before_and_after_revocation():
+        first = lookup_user()
+        time.sleep(0.4)
+        return first, lookup_user()
+
+    assert run_against(standin, look_up_before_and_after_revocation) == ('1000', '1000')
+    assert standin.injected['revoked app token'] == 1
+    assert standin.requests['auth'] == 2
+    assert standin.requests['helix'] == 3
+
+
+def test_a_call_still_unauthorized_after_the_retry_fails():
+    standin = StandIn(faults=Faults(app_token_ttl=-1))
+    with pytest.raises(ContentError):
+        run_against(standin, lookup_user)
+    assert standin.requests['auth'] == 2
+    assert standin.requests['helix'] == 2
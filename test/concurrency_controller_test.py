@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from util.concurrency_controller import ConcurrencyController
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('util.stopwatch.time', lambda: now[0])
+    return now
+
+
+# a window closes after as many successes as the limit allows at once
+def run_window(controller, clock, seconds, latency, size=100):
+    clock[0] += seconds
+    for _ in range(controller.limit()):
+        controller.on_success(size, latency)
+
+
+def test_starts_at_the_minimum_and_grows_by_one_per_window_up_to_the_maximum(clock):
+    controller = ConcurrencyController(2, 4)
+    assert controller.limit() == 2
+    limits = []
+    for _ in range(4):
+        run_window(controller, clock, seconds=1, latency=0.1)
+        limits.append(controller.limit())
+    assert limits == [3, 4, 4, 4]
+
+
+def test_only_adjusts_once_a_window_is_complete(clock):
+    controller = ConcurrencyController(3, 8)
+    clock[0] += 1
+    controller.on_success(100, 0.1)
+    controller.on_success(100, 0.1)
+    assert controller.limit() == 3
+    controller.on_success(100, 0.1)
+    assert controller.limit() == 4
+
+
+def test_errors_halve_the_limit_but_not_below_the_minimum(clock):
+    controller = ConcurrencyController(2, 16)
+    for _ in range(6):
+        run_window(controller, clock, seconds=1, latency=0.1)
+    assert controller.limit() == 8
+    controller.on_error()
+    assert controller.limit() == 4
+    controller.on_error()
+    controller.on_error()
+    assert controller.limit() == 2
+
+
+def test_an_error_starts_a_new_window_that_counts_as_an_improvement(clock):
+    controller = ConcurrencyController(4, 16)
+    run_window(controller, clock, seconds=1, latency=0.1)
+    controller.on_error()
+    assert controller.limit() == 4
+    run_window(controller, clock, seconds=100, latency=0.1)
+    assert controller.limit() == 5
+
+
+def test_rising_latency_without_more_throughput_cuts_the_limit(clock):
+    controller = ConcurrencyController(2, 16)
+    for _ in range(3):
+        run_window(controller, clock, seconds=1, latency=0.1)
+    assert controller.limit() == 5
+    run_window(controller, clock, seconds=10, latency=1.0)
+    assert controller.limit() == 3
+
+
+def test_less_throughput_at_steady_latency_keeps_the_limit(clock):
+    controller = ConcurrencyController(2, 16)
+    for _ in range(3):
+        run_window(controller, clock, seconds=1, latency=0.1)
+    run_window(controller, clock, seconds=10, latency=0.1)
+    assert controller.limit() == 5
+
+
+def test_no_more_than_limit_holders_at_once():
+    controller = ConcurrencyController(2, 4)
+    holding = []
+    most_holding = []
+
+    async def hold():
+        async with controller:
+            holding.append(1)
+            most_holding.append(len(holding))
+            await asyncio.sleep(0.01)
+            holding.pop()
+
+    async def run():
+        await asyncio.gather(*[hold() for _ in range(6)])
+
+    asyncio.run(run())
+    assert max(most_holding) == 2 and len(most_holding) == 6
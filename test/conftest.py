@@ -0,0 +1,44 @@
+import pytest
+
+from twitch.constants import Twitch
+from util.asynccontents import AsyncContents
+from util.auth_header_provider import AuthHeaderProvider
+
+
+# runs a test in tmp_path/out, with its own home, cache and config directories and
+# credentials for the stand-in. Twitch endpoints and AsyncContents settings changed
+# by the test, e.g. by point_twitch_at or configure, are restored afterwards,
+# and no app access token is carried over from another test
+@pytest.fixture
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setenv('XDG_CONFIG_HOME', str(tmp_path / 'config'))
+    (tmp_path / 'config' / 'tw-dl').mkdir(parents=True)
+    (tmp_path / 'config' / 'tw-dl' / 'credentials').write_text('standin-client\nstandin-secret\n')
+    (tmp_path / 'out').mkdir()
+    monkeypatch.chdir(tmp_path / 'out')
+    for name, value in vars(Twitch).items():
+        if not name.startswith('_'):
+            monkeypatch.setattr(Twitch, name, value)
+    contents = AsyncContents()
+    for name in ('_connections', '_connections_per_host', '_dns_cache_seconds', '_connect_timeout', '_read_timeout'):
+        monkeypatch.setattr(contents, name, getattr(contents, name))
+    monkeypatch.setattr(AuthHeaderProvider, '_AuthHeaderProvider__token', None)
+    monkeypatch.setattr(AuthHeaderProvider, '_AuthHeaderProvider__resource', None)
+    return tmp_path
+
+
+@pytest.fixture
+def in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def read():
+    def read_file(file_name):
+        with open(file_name, 'rb') as file:
+            return file.read()
+
+    return read_file
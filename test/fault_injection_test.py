@@ -0,0 +1,177 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+from benchmark.standin import LIVE_PATH, VOD_PATH, Faults, StandIn, point_twitch_at
+from twitch.playlist import Playlist
+from twitch.recorder import ChannelOfflineException, Recorder
+from twitch.vod_downloader import VodDownloader
+from twitch.vod_journal import VodJournal
+from util.asynccontents import AsyncContents, ResponseError
+from util.concurrency_controller import ConcurrencyController
+
+VOD_ID = '1000'
+CHANNEL = 'standin'
+SEGMENT_SIZE = 64 * 1024
+ATTEMPTS = 5
+
+
+# every failed request is one injected fault, so anything beyond
+# one request per segment and fault means a retry too many
+def assert_bounded(standin, segment_count):
+    assert standin.requests['segment'] <= segment_count + sum(standin.injected.values())
+
+
+# stalled responses are given up on quickly, isolated restores the setting
+@pytest.fixture(autouse=True)
+def short_read_timeout(isolated):
+    AsyncContents().configure(read_timeout=0.5)
+
+
+def run_against(standin, scenario):
+    async def run():
+        async with standin:
+            point_twitch_at(standin.url)
+            return await scenario()
+
+    return asyncio.run(run())
+
+
+def download_vod(concurrency=None):
+    async def scenario():
+        playlist = await asyncio.get_event_loop().run_in_executor(None, Playlist().fetch_vod_playlist, VOD_ID)
+        segments = playlist.uris_between(0, sys.maxsize)
+        journal = VodJournal(VOD_ID, 0, sys.maxsize)
+        journal.start('vod.ts', len(segments))
+        open('vod.ts', 'w').close()
+        await VodDownloader(segments, journal, concurrency or ConcurrencyController(2, 8)).download_to('vod.ts')
+        return 'vod.ts'
+
+    return scenario
+
+
+def record_live():
+    async def scenario():
+        await Recorder().record(CHANNEL)
+        recordings = [name for name in os.listdir('.') if name.endswith('.ts')]
+        assert len(recordings) == 1
+        return recordings[0]
+
+    return scenario
+
+
+def test_vod_download_survives_resets_stalls_and_server_errors(read):
+    standin = StandIn(
+        segment_size=SEGMENT_SIZE,
+        vod_segments=40,
+        faults=Faults(reset=0.05, stall=0.03, stall_seconds=2, error_burst_every=20, error_burst_length=2, seed=1)
+    )
+    data = read(run_against(standin, download_vod()))
+    assert data == standin.vod_data(VOD_ID)
+    assert standin.injected['reset'] > 0 and standin.injected['server error'] > 0
+    assert_bounded(standin, 40)
+
+
+def test_vod_download_without_faults_fetches_every_segment_once(read):
+    standin = StandIn(segment_size=SEGMENT_SIZE, vod_segments=20, muted_every=7)
+    created_before, reused_before = AsyncContents().connection_stats()
+    data = read(run_against(standin, download_vod()))
+    assert data == standin.vod_data(VOD_ID)
+    assert standin.requests['segment'] == 20
+    assert all(count == 1 for count in standin.segment_requests.values())
+    created, reused = AsyncContents().connection_stats()
+    # kept-alive connections serve the segments after the first few
+    assert created - created_before <= 8 and reused - reused_before >= 12
+
+
+class CountingController(ConcurrencyController):
+    def __init__(self, min_limit, max_limit):
+        super().__init__(min_limit, max_limit)
+        self.errors = 0
+
+    def on_error(self):
+        self.errors += 1
+        super().on_error()
+
+
+def test_every_failed_attempt_is_reported_to_the_concurrency_controller(read):
+    standin = StandIn(
+        segment_size=SEGMENT_SIZE,
+        vod_segments=30,
+        faults=Faults(error_burst_every=10, error_burst_length=2)
+    )
+    controller = CountingController(2, 8)
+    data = read(run_against(standin, download_vod(controller)))
+    assert data == standin.vod_data(VOD_ID)
+    assert controller.errors == standin.injected['server error'] > 0
+
+
+def test_vod_segment_failing_for_good_takes_one_request_per_attempt():
+    standin = StandIn(segment_size=SEGMENT_SIZE, vod_segments=10, faults=Faults(broken_segments={3}))
+    with pytest.raises(ResponseError):
+        run_against(standin, download_vod())
+    assert standin.segment_requests[VOD_PATH.format(VOD_ID) + '/3.ts'] == ATTEMPTS
+
+
+def test_live_segment_failing_for_good_takes_one_request_per_attempt(read):
+    standin = StandIn(
+        segment_size=SEGMENT_SIZE,
+        live_segment_duration=0.3,
+        live_segments=12,
+        live_window=8,
+        faults=Faults(broken_segments={3})
+    )
+    data = read(run_against(standin, record_live()))
+    assert data == standin.live_data(CHANNEL, [sequence for sequence in range(12) if sequence != 3])
+    assert standin.segment_requests[LIVE_PATH.format(CHANNEL) + '/3.ts'] == ATTEMPTS
+
+
+def test_head_requests_retry_random_bad_requests():
+    standin = StandIn(segment_size=SEGMENT_SIZE, faults=Faults(head_bad_request=0.4, seed=2))
+
+    async def scenario():
+        async with AsyncContents():
+            for index in range(10):
+                headers = await AsyncContents().headers(standin.url + VOD_PATH.format(VOD_ID) + f'/{index}.ts')
+                assert int(headers['Content-Length']) == SEGMENT_SIZE
+
+    run_against(standin, scenario)
+    assert standin.injected['bad request'] > 0
+    assert_bounded(standin, 10)
+
+
+def test_recording_survives_resets_server_errors_and_expiring_tokens(read):
+    standin = StandIn(
+        segment_size=SEGMENT_SIZE,
+        live_segment_duration=0.3,
+        live_segments=16,
+        live_window=8,
+        faults=Faults(reset=0.1, error_burst_every=7, error_burst_length=2, token_ttl=1, seed=3)
+    )
+    data = read(run_against(standin, record_live()))
+    assert data == standin.live_data(CHANNEL, range(16))
+    assert standin.injected['expired link'] > 0
+    assert_bounded(standin, 16)
+
+
+def test_recording_waits_out_empty_playlists(read):
+    standin = StandIn(
+        segment_size=SEGMENT_SIZE,
+        live_segment_duration=0.3,
+        live_segments=16,
+        live_window=8,
+        faults=Faults(empty_playlist_every=5, empty_playlist_length=2)
+    )
+    data = read(run_against(standin, record_live()))
+    assert data == standin.live_data(CHANNEL, range(16))
+    assert standin.injected['empty playlist'] > 0
+    assert standin.requests['segment'] == 16
+
+
+def test_recording_an_offline_channel_fails_fast():
+    standin = StandIn(segment_size=SEGMENT_SIZE, live_segment_duration=0.3, live_segments=0, live_window=0)
+    with pytest.raises(ChannelOfflineException):
+        run_against(standin, record_live())
+    assert standin.requests['segment'] == 0
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from benchmark.standin import StandIn, point_twitch_at
+from twitch.helix import Helix
+
+pytestmark = pytest.mark.usefixtures('isolated')
+
+
+def run_against(standin, action):
+    async def run():
+        async with standin:
+            point_twitch_at(standin.url)
+            return await asyncio.get_event_loop().run_in_executor(None, action)
+
+    return asyncio.run(run())
+
+
+def test_lookups_are_paged_and_answered_in_input_order():
+    video_ids = [str(video_id) for video_id in range(2250, 2000, -1)]
+    unknown = {'2250', '2150', '2101', '2001'}
+    standin = StandIn(unknown_keys=unknown)
+    videos = run_against(standin, lambda: list(Helix.videos_by_id(video_ids)))
+    assert [video_id for video_id, _ in videos] == video_ids
+    for video_id, video in videos:
+        assert (video is None) == (video_id in unknown)
+        assert video is None or video['id'] == video_id
+    assert standin.requests['helix'] == 3
+
+
+def test_logins_are_matched_regardless_of_case():
+    standin = StandIn(unknown_keys={'nobody'})
+    users = run_against(standin, lambda: list(Helix.users_by_login(['StandIn', 'nobody'])))
+    assert users[0][0] == 'StandIn' and users[0][1]['login'] == 'standin'
+    assert users[1] == ('nobody', None)
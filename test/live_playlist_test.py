@@ -0,0 +1,58 @@
+from twitch.live_playlist import LivePlaylist
+
+PLAYLIST = '''#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-TARGETDURATION:6
+#EXT-X-MEDIA-SEQUENCE:100
+#EXT-X-PROGRAM-DATE-TIME:2024-01-01T00:00:00.000Z
+#EXTINF:2.000,live
+https://video/100.ts
+#EXTINF:2.000,Amazon
+https://video/101.ts
+#EXTINF:2.000,live
+https://video/102.ts
+#EXTINF:1.500,live
+https://video/103.ts
+'''
+
+
+def sequences(playlist):
+    return [segment.sequence for segment in playlist.new_segments]
+
+
+def test_numbers_segments_from_the_media_sequence():
+    playlist = LivePlaylist.parse(PLAYLIST)
+    assert playlist.media_sequence == 100 and playlist.target_duration == 6
+    assert sequences(playlist) == [100, 101, 102, 103]
+    assert playlist.new_segments[3].uri == 'https://video/103.ts'
+    assert playlist.new_segments[3].duration == 1.5
+    assert playlist.last_sequence() == 103
+
+
+def test_only_segments_after_the_given_sequence_are_new():
+    playlist = LivePlaylist.parse(PLAYLIST, after_sequence=101)
+    assert sequences(playlist) == [102, 103]
+    assert playlist.segment_count == 4 and playlist.last_sequence() == 103
+    assert sequences(LivePlaylist.parse(PLAYLIST, after_sequence=103)) == []
+
+
+def test_ad_segments_count_as_segments_but_not_as_live_ones():
+    playlist = LivePlaylist.parse(PLAYLIST)
+    assert playlist.segment_count == 4
+    assert playlist.live_segment_count == 3
+    assert playlist.new_segments[1].title == 'Amazon'
+
+
+def test_a_missing_media_sequence_starts_at_zero():
+    playlist = LivePlaylist.parse(PLAYLIST.replace('#EXT-X-MEDIA-SEQUENCE:100\n', ''))
+    assert sequences(playlist) == [0, 1, 2, 3]
+
+
+def test_uris_without_extinf_are_not_segments():
+    raw_playlist = PLAYLIST.replace('#EXTINF:2.000,Amazon\n', '') + 'https://video/stray.ts\n'
+    playlist = LivePlaylist.parse(raw_playlist)
+    assert playlist.segment_count == 3
+    assert [segment.uri for segment in playlist.new_segments] == [
+        'https://video/100.ts', 'https://video/102.ts', 'https://video/103.ts'
+    ]
+    assert sequences(playlist) == [100, 101, 102]
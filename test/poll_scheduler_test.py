@@ -0,0 +1,86 @@
+import pytest
+
+from twitch.poll_scheduler import PollScheduler
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('twitch.poll_scheduler.time', lambda: now[0])
+    return now
+
+
+def test_waits_a_target_duration_after_new_segments(clock):
+    scheduler = PollScheduler()
+    scheduler.on_segments(2, 5)
+    assert scheduler.interval() == 2
+    clock[0] += 2
+    scheduler.on_segments(2, 1)
+    assert scheduler.interval() == 2
+
+
+def test_follows_a_faster_cadence_smoothly(clock):
+    scheduler = PollScheduler()
+    scheduler.on_segments(2, 5)
+    clock[0] += 2
+    scheduler.on_segments(2, 2)
+    assert scheduler.interval() == 1
+    clock[0] += 3
+    scheduler.on_segments(2, 1)
+    assert scheduler.interval() == pytest.approx(1.6)
+
+
+def test_never_waits_longer_than_the_target_duration(clock):
+    scheduler = PollScheduler()
+    scheduler.on_segments(2, 5)
+    clock[0] += 3
+    scheduler.on_segments(2, 1)
+    assert scheduler.interval() == 2
+
+
+def test_polls_again_sooner_after_a_poll_without_new_segments(clock):
+    scheduler = PollScheduler()
+    scheduler.on_segments(4, 5)
+    clock[0] += 1
+    scheduler.on_segments(4, 0)
+    assert scheduler.interval() == 2
+
+
+def test_never_polls_more_often_than_the_minimum_interval(clock):
+    scheduler = PollScheduler()
+    scheduler.on_segments(1, 5)
+    clock[0] += 0.5
+    scheduler.on_segments(1, 0)
+    assert scheduler.interval() == 0.5
+
+
+def test_backs_off_while_idle(clock):
+    scheduler = PollScheduler()
+    scheduler.on_segments(2, 5)
+    clock[0] += 5
+    scheduler.on_segments(2, 0)
+    assert scheduler.interval() == 4
+
+
+def test_backs_off_during_ads(clock):
+    scheduler = PollScheduler()
+    scheduler.on_segments(2, 5)
+    scheduler.on_ad()
+    assert scheduler.interval() == 4
+    assert not scheduler.stalled()
+
+
+def test_stalls_after_six_target_durations_but_not_before_fifteen_seconds(clock):
+    scheduler = PollScheduler()
+    scheduler.on_segments(2, 5)
+    clock[0] += 14
+    scheduler.on_segments(2, 0)
+    assert not scheduler.stalled()
+    clock[0] += 2
+    assert scheduler.stalled()
+    scheduler = PollScheduler()
+    scheduler.on_segments(4, 5)
+    clock[0] += 23
+    assert not scheduler.stalled()
+    clock[0] += 2
+    assert scheduler.stalled()
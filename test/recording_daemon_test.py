@@ -0,0 +1,48 @@
+import asyncio
+import os
+
+import pytest
+
+from benchmark.standin import StandIn, point_twitch_at
+from twitch.recording_daemon import ChannelWatcher
+from twitch.recording_output import RecordingOutput
+from twitch.token import Token
+from util.contents import ContentError
+
+SEGMENT_SIZE = 64 * 1024
+
+pytestmark = pytest.mark.usefixtures('isolated')
+
+
+def recorded(expected, read):
+    return any(read(name) == expected for name in os.listdir('.') if name.endswith('.ts'))
+
+
+def test_an_error_only_ends_its_own_channel(monkeypatch, read):
+    fetch_for_channel = Token.fetch_for_channel
+
+    def fetch_failing_for_broken(self, channel_name):
+        if channel_name == 'broken':
+            raise ContentError('Failed to get https://gql.twitch.tv/gql: got 500 response')
+        return fetch_for_channel(self, channel_name)
+
+    monkeypatch.setattr(Token, 'fetch_for_channel', fetch_failing_for_broken)
+    standin = StandIn(segment_size=SEGMENT_SIZE, live_segment_duration=0.2, live_segments=10, live_window=5)
+
+    async def scenario():
+        async with standin:
+            point_twitch_at(standin.url)
+            download_slots = asyncio.Semaphore(8)
+            watchers = [ChannelWatcher(channel, download_slots, RecordingOutput) for channel in ['broken', 'standin']]
+            tasks = [asyncio.ensure_future(watcher.watch()) for watcher in watchers]
+            expected = standin.live_data('standin', range(10))
+            for _ in range(100):
+                if recorded(expected, read) or any(task.done() for task in tasks):
+                    break
+                await asyncio.sleep(0.1)
+            for watcher in watchers:
+                watcher.stop()
+            await asyncio.wait_for(asyncio.gather(*tasks), 5)
+            return recorded(expected, read)
+
+    assert asyncio.run(scenario())
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from twitch.recording_output import RecordingOutput
+
+
+pytestmark = pytest.mark.usefixtures('in_tmp_path')
+
+
+def test_writes_a_single_file_without_limits(read):
+    output = RecordingOutput('stream')
+    for index in range(5):
+        output.write(bytes([index]) * 10, 2.0)
+    output.close()
+    assert os.listdir('.') == ['stream.ts']
+    assert read('stream.ts') == b''.join(bytes([index]) * 10 for index in range(5))
+
+
+def test_rolls_over_by_size_and_indexes_completed_parts(read):
+    output = RecordingOutput('stream', max_part_size=25, write_index=True)
+    for index in range(5):
+        output.write(bytes([index]) * 10, 2.0)
+    assert read('stream part 001.ts') == bytes([0]) * 10 + bytes([1]) * 10
+    index = read('stream.m3u8').decode()
+    assert 'stream part 001.ts' in index and 'stream part 002.ts' in index
+    assert 'stream part 003.ts' not in index and '#EXT-X-ENDLIST' not in index
+    output.close()
+    assert read('stream part 003.ts') == bytes([4]) * 10
+    assert read('stream.m3u8').decode().endswith('#EXTINF:2.000,\nstream part 003.ts\n#EXT-X-ENDLIST\n')
+
+
+def test_rolls_over_by_duration():
+    output = RecordingOutput('stream', max_part_seconds=5)
+    for index in range(5):
+        output.write(b'x', 2.0)
+    output.close()
+    assert sorted(os.listdir('.')) == ['stream part 001.ts', 'stream part 002.ts', 'stream part 003.ts']
+
+
+def test_renaming_moves_every_part_and_avoids_existing_recordings(read):
+    open('title part 001.ts', 'w').close()
+    output = RecordingOutput('0123abcd', max_part_size=10, write_index=True)
+    output.write(b'a' * 10, 2.0)
+    output.write(b'b' * 10, 2.0)
+    output.rename_to('title')
+    output.write(b'c' * 5, 2.0)
+    output.close()
+    assert read('title 01 part 001.ts') == b'a' * 10
+    assert read('title 01 part 002.ts') == b'b' * 10
+    assert read('title 01 part 003.ts') == b'c' * 5
+    assert 'title 01 part 003.ts' in read('title 01.m3u8').decode()
+    assert not any(name.startswith('0123abcd') for name in os.listdir('.'))
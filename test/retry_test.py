@@ -0,0 +1,153 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from types import SimpleNamespace
+
+import pytest
+from aiohttp import ClientConnectionError, ClientPayloadError, ClientResponseError
+from requests import exceptions
+
+from util.asynccontents import AsyncContents, ResponseError
+from util.contents import Contents, RetryableResponse
+from util.retry import NO_RETRY, RetryBudget, RetryPolicy, retry_after_seconds
+
+
+class Unavailable(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__('unavailable')
+        self.retry_after = retry_after
+
+
+def failing(errors):
+    calls = []
+
+    def action():
+        calls.append(len(calls))
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return 'done'
+
+    return action, calls
+
+
+def test_gives_up_after_the_last_attempt():
+    policy = RetryPolicy(lambda error: True, attempts=3, base_delay=0)
+    action, calls = failing([Unavailable()] * 3)
+    with pytest.raises(Unavailable):
+        policy.call(action)
+    assert len(calls) == 3
+
+
+def test_succeeds_within_the_attempts():
+    policy = RetryPolicy(lambda error: True, attempts=3, base_delay=0)
+    action, calls = failing([Unavailable()] * 2)
+    assert policy.call(action) == 'done'
+    assert len(calls) == 3
+
+
+def test_errors_that_are_not_retryable_are_raised_at_once():
+    policy = RetryPolicy(lambda error: isinstance(error, Unavailable), base_delay=0)
+    action, calls = failing([ValueError()])
+    with pytest.raises(ValueError):
+        policy.call(action)
+    assert len(calls) == 1
+
+
+def test_no_retry_makes_a_single_attempt():
+    action, calls = failing([Unavailable()])
+    with pytest.raises(Unavailable):
+        NO_RETRY.call(action)
+    assert len(calls) == 1
+
+
+def test_a_spent_budget_ends_the_retries_of_every_action_sharing_it():
+    policy = RetryPolicy(lambda error: True, base_delay=0).with_budget(RetryBudget(3))
+    first, first_calls = failing([Unavailable()] * 2)
+    assert policy.call(first) == 'done'
+    second, second_calls = failing([Unavailable()] * 2)
+    with pytest.raises(Unavailable):
+        policy.call(second)
+    assert len(first_calls) == 3 and len(second_calls) == 2
+
+
+def test_a_refilling_budget_gets_retries_back(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('util.retry.time.monotonic', lambda: now[0])
+    budget = RetryBudget(2, refill_seconds=5)
+    assert budget.try_spend() and budget.try_spend() and not budget.try_spend()
+    now[0] += 12
+    assert budget.try_spend() and budget.try_spend() and not budget.try_spend()
+
+
+def test_async_calls_retry_alike():
+    policy = RetryPolicy(lambda error: True, attempts=3, base_delay=0)
+    action, calls = failing([Unavailable()] * 2)
+
+    async def async_action():
+        return action()
+
+    assert asyncio.run(policy.call_async(async_action)) == 'done'
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize('value, seconds', [('120', 120), ('1.5', 1.5), ('-3', 0), ('soon', None), ('', None)])
+def test_retry_after_in_seconds(value, seconds):
+    assert retry_after_seconds({'Retry-After': value}) == seconds
+
+
+def test_retry_after_as_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=90)
+    assert 85 <= retry_after_seconds({'Retry-After': format_datetime(retry_at, usegmt=True)}) <= 90
+    past = datetime.now(timezone.utc) - timedelta(seconds=90)
+    assert retry_after_seconds({'Retry-After': format_datetime(past, usegmt=True)}) == 0
+    assert retry_after_seconds({}) is None and retry_after_seconds(None) is None
+
+
+def response_error(method, status):
+    return ResponseError(SimpleNamespace(method=method, url='http://twitch/', status=status, reason='', headers={}))
+
+
+@pytest.mark.parametrize('error, retryable', [
+    (response_error('GET', 503), True),
+    (response_error('GET', 429), True),
+    (response_error('GET', 404), False),
+    (response_error('GET', 400), False),
+    (response_error('HEAD', 400), True),
+    (ClientResponseError(None, (), status=400, message='invalid constant string'), True),
+    (ClientResponseError(None, (), status=400, message='bad request'), False),
+    (ClientConnectionError(), True),
+    (ClientPayloadError(), True),
+    (asyncio.TimeoutError(), True),
+    (ValueError(), False),
+])
+def test_async_contents_retryable_errors(error, retryable):
+    assert AsyncContents.is_retryable(error) == retryable
+
+
+@pytest.mark.parametrize('error, retryable', [
+    (RetryableResponse(SimpleNamespace(status_code=503, headers={})), True),
+    (exceptions.ConnectionError(), True),
+    (exceptions.Timeout(), True),
+    (exceptions.ChunkedEncodingError(), True),
+    (exceptions.TooManyRedirects(), False),
+    (ValueError(), False),
+])
+def test_contents_retryable_errors(error, retryable):
+    assert Contents.is_retryable(error) == retryable
+
+
+def test_retry_after_is_waited_up_to_max_delay():
+    delays = []
+    policy = RetryPolicy(lambda error: True, base_delay=0, max_delay=0.05,
+                         on_retry=lambda error, attempt, delay: delays.append(delay))
+    action, calls = failing([Unavailable(retry_after=0.05)])
+    assert policy.call(action) == 'done'
+    assert delays == [0.05]
+
+
+def test_retry_after_beyond_max_delay_is_given_up_on():
+    policy = RetryPolicy(lambda error: True, base_delay=0, max_delay=30)
+    action, calls = failing([Unavailable(retry_after=86400)])
+    with pytest.raises(Unavailable):
+        policy.call(action)
+    assert len(calls) == 1
@@ -0,0 +1,48 @@
+import pytest
+
+from twitch.sequence_tracker import SequenceTracker
+
+pytestmark = pytest.mark.usefixtures('isolated')
+
+
+def test_nothing_is_lost_before_any_segment_was_seen():
+    tracker = SequenceTracker('channel')
+    assert not tracker.has_seen_any()
+    assert len(tracker.lost_between(100, 105)) == 0
+
+
+def test_reports_exactly_the_sequences_that_left_the_playlist_unseen():
+    tracker = SequenceTracker('channel')
+    tracker.advance_to(105)
+    assert tracker.lost_between(106, 110) == range(106, 106)
+    assert tracker.lost_between(109, 115) == range(106, 109)
+
+
+def test_a_lower_last_sequence_starts_a_new_broadcast():
+    tracker = SequenceTracker('channel')
+    tracker.advance_to(105)
+    assert len(tracker.lost_between(0, 4)) == 0
+    assert not tracker.has_seen_any()
+    tracker.advance_to(4)
+    assert tracker.last_sequence() == 4
+
+
+def test_only_written_sequences_are_remembered_across_restarts():
+    tracker = SequenceTracker('channel')
+    tracker.advance_to(105)
+    tracker.schedule_up_to(110)
+    assert tracker.last_sequence() == 110
+    assert tracker.lost_between(111, 115) == range(111, 111)
+    assert SequenceTracker('channel').last_sequence() == 105
+    tracker.advance_to(103)
+    assert SequenceTracker('channel').last_sequence() == 105
+
+
+def test_the_last_sequence_is_forgotten_after_a_minute(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('util.persistent_resource.time', lambda: now[0])
+    SequenceTracker('channel').advance_to(105)
+    now[0] += 59
+    assert SequenceTracker('channel').last_sequence() == 105
+    now[0] += 2
+    assert not SequenceTracker('channel').has_seen_any()
@@ -0,0 +1,37 @@
+import pytest
+
+from twitch.video_index import VideoIndex
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    index = VideoIndex('42')
+    index.refresh([
+        {'id': '3', 'created_at': '2024-03-01T00:00:00Z', 'title': 'ÜBER STREAM', 'view_count': 1234},
+        {'id': '2', 'created_at': '2024-02-01T00:00:00Z', 'title': 'Über stream', 'view_count': 99},
+        {'id': '1', 'created_at': '2024-01-01T00:00:00Z', 'title': 'Plain Stream', 'view_count': 5},
+    ])
+    yield index
+    index.close()
+
+
+def ids(videos):
+    return [video['id'] for video in videos]
+
+
+def test_search_ignores_case_beyond_ascii(index):
+    assert ids(index.search('über', ['title'])) == ['3', '2']
+
+
+def test_search_matches_numbers_and_any_of_the_attributes(index):
+    assert ids(index.search('stream', ['title'])) == ['3', '2', '1']
+    assert ids(index.search('12', ['id', 'view_count'])) == ['3']
+
+
+def test_refresh_stops_at_the_first_known_video(index):
+    assert index.refresh([
+        {'id': '4', 'created_at': '2024-04-01T00:00:00Z', 'title': 'New'},
+        {'id': '3', 'created_at': '2024-03-01T00:00:00Z', 'title': 'ÜBER STREAM'},
+    ]) == 1
+    assert ids(index.search('new', ['title'])) == ['4']
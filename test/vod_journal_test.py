@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+from benchmark.standin import StandIn, point_twitch_at
+from twitch.playlist import Playlist
+from twitch.vod_downloader import StoppedException, VodDownloader
+from twitch.vod_journal import VodJournal
+from util.concurrency_controller import ConcurrencyController
+
+VOD_ID = '1000'
+SEGMENT_COUNT = 20
+SEGMENT_SIZE = 64 * 1024
+
+pytestmark = pytest.mark.usefixtures('isolated')
+
+
+# like twitch-dl, resumes the journalled download or starts a new one,
+# and stops once the given number of segments has been written
+def download(standin, stop_after=None):
+    async def run():
+        async with standin:
+            point_twitch_at(standin.url)
+            playlist = await asyncio.get_event_loop().run_in_executor(None, Playlist().fetch_vod_playlist, VOD_ID)
+            segments = playlist.uris_between(0, sys.maxsize)
+            journal = VodJournal(VOD_ID, 0, sys.maxsize)
+            file_name = journal.resumable_file_name(len(segments))
+            if file_name is None:
+                file_name = 'vod.ts'
+                open(file_name, 'w').close()
+                journal.start(file_name, len(segments))
+            downloader = VodDownloader(segments, journal, ConcurrencyController(1, 1))
+            if stop_after is not None:
+                commit = journal.commit
+
+                def commit_and_stop(segment_count, size):
+                    commit(segment_count, size)
+                    if journal.committed_segments() == stop_after:
+                        downloader.stop()
+
+                journal.commit = commit_and_stop
+            try:
+                await downloader.download_to(file_name)
+            except StoppedException:
+                pass
+            return file_name
+
+    return asyncio.run(run())
+
+
+def test_interrupted_download_resumes_where_it_stopped(read):
+    standin = StandIn(segment_size=SEGMENT_SIZE, vod_segments=SEGMENT_COUNT)
+    download(standin, stop_after=8)
+    # segments queued for writing when it stopped are still committed
+    committed = VodJournal(VOD_ID, 0, sys.maxsize).committed_segments()
+    assert 8 <= committed < SEGMENT_COUNT
+    assert read('vod.ts')[:committed * SEGMENT_SIZE] == standin.vod_data(VOD_ID, 0, committed - 1)
+    with open('vod.ts', 'ab') as vod_file:
+        # a segment written past the last commit
+        vod_file.write(b'x' * 1000)
+    standin.reset_stats()
+    assert download(standin) == 'vod.ts'
+    assert read('vod.ts') == standin.vod_data(VOD_ID)
+    assert standin.requests['segment'] == SEGMENT_COUNT - committed
+    assert VodJournal(VOD_ID, 0, sys.maxsize).resumable_file_name(SEGMENT_COUNT) is None
+
+
+def test_download_is_not_resumed_into_a_file_of_the_same_name_elsewhere(read):
+    standin = StandIn(segment_size=SEGMENT_SIZE, vod_segments=SEGMENT_COUNT)
+    download(standin, stop_after=8)
+    os.mkdir('../elsewhere')
+    os.chdir('../elsewhere')
+    unrelated = b'unrelated' * 100000
+    with open('vod.ts', 'wb') as unrelated_file:
+        unrelated_file.write(unrelated)
+    assert VodJournal(VOD_ID, 0, sys.maxsize).resumable_file_name(SEGMENT_COUNT) is None
+    assert read('vod.ts') == unrelated
+    os.chdir('../out')
+    assert VodJournal(VOD_ID, 0, sys.maxsize).resumable_file_name(SEGMENT_COUNT) == 'vod.ts'
+
+
+def test_commits_are_stored_in_batches(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('twitch.vod_journal.time', lambda: now[0])
+    journal = VodJournal(VOD_ID, 0, sys.maxsize)
+    journal.start('vod.ts', SEGMENT_COUNT)
+    journal.commit(1, SEGMENT_SIZE)
+    journal.commit(1, SEGMENT_SIZE)
+    assert journal.committed_segments() == 2
+    assert VodJournal(VOD_ID, 0, sys.maxsize).committed_segments() == 0
+    now[0] += 2
+    journal.commit(1, SEGMENT_SIZE)
+    assert VodJournal(VOD_ID, 0, sys.maxsize).committed_size() == 3 * SEGMENT_SIZE
+    journal.commit(1, SEGMENT_SIZE)
+    journal.flush()
+    assert VodJournal(VOD_ID, 0, sys.maxsize).committed_segments() == 4
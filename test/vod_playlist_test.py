@@ -0,0 +1,49 @@
+import pytest
+
+from twitch.vod_playlist import VodPlaylist
+
+BASE_PATH = 'https://vod/1000/chunked'
+
+
+def playlist_of(*names):
+    lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:10']
+    for name in names:
+        lines += ['#EXTINF:10.000,', name]
+    lines.append('#EXT-X-ENDLIST')
+    return VodPlaylist.parse('\n'.join(lines), BASE_PATH)
+
+
+PLAYLIST = playlist_of('0.ts', '1.ts', '2.ts', '3.ts', '4.ts')
+
+
+@pytest.mark.parametrize('start_time, end_time, indices', [
+    (0, 10, [0]),
+    (10, 20, [1]),
+    (10, 30, [1, 2]),
+    (5, 25, [0, 1, 2]),
+    (9.5, 10.5, [0, 1]),
+    (0, 50, [0, 1, 2, 3, 4]),
+    (45, 1000, [4]),
+    (50, 60, []),
+    (20, 20, []),
+])
+def test_indices_between_take_every_segment_overlapping_the_range(start_time, end_time, indices):
+    assert list(PLAYLIST.indices_between(start_time, end_time)) == indices
+
+
+def test_uris_between_are_absolute_and_sliceable():
+    uris = PLAYLIST.uris_between(10, 40)
+    assert list(uris) == [BASE_PATH + '/1.ts', BASE_PATH + '/2.ts', BASE_PATH + '/3.ts']
+    assert list(uris[1:]) == [BASE_PATH + '/2.ts', BASE_PATH + '/3.ts']
+    assert uris[-1] == BASE_PATH + '/3.ts'
+    assert len(uris[5:]) == 0
+
+
+def test_adjacent_muted_segments_merge_into_one_range():
+    playlist = playlist_of('0.ts', '1-muted.ts', '2-muted.ts', '3.ts', '4-muted.ts')
+    assert playlist.muted_ranges() == [(10, 30), (40, 50)]
+    assert playlist.is_muted(1) and not playlist.is_muted(3)
+
+
+def test_no_muted_segments_means_no_muted_ranges():
+    assert PLAYLIST.muted_ranges() == []
@@ -9,41 +9,19 @@ from optparse import OptionParser, OptionValueError
 
 from twitch.playlist import Playlist as PlaylistFetcher
 from twitch.vod import Vod
-from twitch.vod_downloader import VodDownloader
+from twitch.vod_downloader import StoppedException, VodDownloader
+from twitch.vod_journal import VodJournal
+from util.asynccontents import AsyncContents
+from util.background import in_background
+from util.concurrency_controller import ConcurrencyController
 from util.log import Log
-
-
-class Chunks:
-    @classmethod
-    def get(cls, segments, start_time, end_time):
-        clipped_segments = cls.__clipped(
-            cls.__with_time(segments),
-            start_time,
-            end_time
-        )
-        return list(map(lambda segment: segment.uri, clipped_segments))
-
-    @staticmethod
-    def __with_time(segments):
-        start = 0
-        with_time = []
-        for segment in segments:
-            with_time.append((start, segment))
-            start += segment.duration
-        return with_time
-
-    @staticmethod
-    def __clipped(segments, start_time, end_time):
-        return [
-            s for (start, s)
-            in segments
-            if (start + s.duration) > start_time and start < end_time
-        ]
+from util.metrics import Metrics
 
 
 class CommandLineParser:
     time_pattern = \
         '^(((?P<h>0{1,2}|[1-9]\\d*):)?((?P<m>[0-5]?[0-9]):))?(?P<s>[0-5]?[0-9])$'
+    vod_pattern = '^(?P<vod_id>\\d+)(@(?P<start>[^-]*)-(?P<end>.*))?$'
 
     def __init__(self):
         parser = OptionParser()
@@ -52,30 +30,70 @@ class CommandLineParser:
         parser.add_option('-e', '--end_time', metavar='END', action='callback',
                           callback=self.__to_seconds, type='string',
                           default=sys.maxsize)
-        parser.usage = '%prog [options] vod_id'
+        parser.add_option('--min-concurrency', metavar='COUNT', type='int', default=2,
+                          help='parallel segment downloads to start with [default: %default]')
+        parser.add_option('--max-concurrency', metavar='COUNT', type='int', default=16,
+                          help='upper bound for parallel segment downloads [default: %default]')
+        parser.add_option('-j', '--parallel-vods', metavar='COUNT', type='int', default=2,
+                          help='vods downloaded at once [default: %default]')
+        parser.add_option('--max-downloads', metavar='COUNT', type='int', default=32,
+                          help='segment downloads running at once across all vods [default: %default]')
+        parser.add_option('--events', metavar='FILE',
+                          help='append a JSON line per request, retry and segment to FILE')
+        parser.add_option('--metrics-file', metavar='FILE',
+                          help='keep Prometheus text format metrics in FILE, rewritten every few seconds')
+        parser.usage = '%prog [options] [vod_id[@START-END] ...]\n\n' \
+                       'Reads vod ids from stdin, one per line, if none are given. ' \
+                       'Anything after a "|" on a line is ignored.'
         self.get_usage = lambda: parser.get_usage()
         self.parse_args = lambda: parser.parse_args()
 
     def __to_seconds(self, option, opt_string, time_string, parser):
-        match = re.search(self.time_pattern, time_string)
-        if not match:
+        seconds = self.__seconds_of(time_string)
+        if seconds is None:
             raise OptionValueError(
                 'Invalid time format for option {}'.format(option.dest)
             )
-        ts = dict(map(lambda g: (g, int(match.group(g) or '0')), ['h', 'm', 's']))
-        seconds = ts['h'] * 3600 + ts['m'] * 60 + ts['s']
         setattr(parser.values, option.dest, seconds)
 
+    def __seconds_of(self, time_string):
+        match = re.search(self.time_pattern, time_string)
+        if not match:
+            return None
+        ts = dict(map(lambda g: (g, int(match.group(g) or '0')), ['h', 'm', 's']))
+        return ts['h'] * 3600 + ts['m'] * 60 + ts['s']
+
     def parse_command_line(self):
         (options, args) = self.parse_args()
-        if len(args) != 1:
+        if len(args) == 0:
+            args = [line.split('|')[0].strip() for line in sys.stdin]
+            args = [arg for arg in args if arg]
+        if len(args) == 0:
             Log.fatal(self.get_usage())
-        if options.end_time <= options.start_time:
-            Log.fatal("End time can't be earlier than start time\n")
-        try:
-            return options.start_time, options.end_time, int(args[0])
-        except ValueError:
+        if not 1 <= options.min_concurrency <= options.max_concurrency:
+            Log.fatal('Concurrency bounds must satisfy 1 <= min <= max\n')
+        if options.parallel_vods < 1 or options.max_downloads < 1:
+            Log.fatal('Vod and download counts must be positive\n')
+        vods = [self.__parse_vod(arg, options) for arg in args]
+        return vods, options
+
+    def __parse_vod(self, arg, options):
+        match = re.search(self.vod_pattern, arg)
+        if not match:
             Log.fatal(self.get_usage())
+        start_time = self.__time_or(match.group('start'), options.start_time)
+        end_time = self.__time_or(match.group('end'), options.end_time)
+        if end_time <= start_time:
+            Log.fatal("End time can't be earlier than start time\n")
+        return int(match.group('vod_id')), start_time, end_time
+
+    def __time_or(self, time_string, default):
+        if not time_string:
+            return default
+        seconds = self.__seconds_of(time_string)
+        if seconds is None:
+            Log.fatal('Invalid time format: {}\n'.format(time_string))
+        return seconds
 
 
 class FileMaker:
@@ -95,16 +113,100 @@ class FileMaker:
         return desired_name if modifier == 0 else new_name
 
 
+class VodBatch:
+    def __init__(self, options):
+        self.__options = options
+        self.__download_slots = asyncio.Semaphore(options.max_downloads)
+        self.__vod_slots = asyncio.Semaphore(options.parallel_vods)
+        self.__downloaders = []
+        self.__titles = {}
+        self.__shared_terminal = False
+        self.__stopped = False
+
+    # all vods share one session and one cap on segment downloads,
+    # the per vod controllers only decide how much of it each vod asks for
+    async def download(self, vods):
+        self.__titles = await self.__titles_of([vod_id for vod_id, _, _ in vods])
+        self.__shared_terminal = min(len(vods), self.__options.parallel_vods) > 1
+        AsyncContents().configure(connections_per_host=self.__options.max_downloads)
+        async with AsyncContents():
+            results = await asyncio.gather(*[self.__download_guarded(*vod) for vod in vods])
+        return all(results)
+
+    # a failed batched lookup leaves every title to be looked up with its own vod,
+    # so a failure only costs the vods it concerns
+    async def __titles_of(self, vod_ids):
+        try:
+            return dict(zip(vod_ids, await in_background(Vod.titles, vod_ids)))
+        except Exception as e:
+            Log.error('Failed to look up vod titles: {}'.format(e))
+            return {}
+
+    async def __title_of(self, vod_id):
+        if vod_id not in self.__titles:
+            self.__titles[vod_id], = await in_background(Vod.titles, [vod_id])
+        return self.__titles[vod_id]
+
+    # a stopped vod is not a failed one, its journal lets the next run resume it
+    async def __download_guarded(self, vod_id, start_time, end_time):
+        async with self.__vod_slots:
+            if self.__stopped:
+                return True
+            try:
+                await self.__download(vod_id, start_time, end_time)
+                return True
+            except StoppedException:
+                Log.info('\nStopped vod {}'.format(vod_id))
+                return True
+            except Exception as e:
+                Log.error('\nFailed to download vod {}: {}'.format(vod_id, e))
+                return False
+
+    async def __download(self, vod_id, start_time, end_time):
+        vod_playlist = await in_background(PlaylistFetcher().fetch_vod_playlist, vod_id)
+        if vod_playlist is None:
+            raise ValueError("Seems like vod {} doesn't exist".format(vod_id))
+        vod_segments = vod_playlist.uris_between(start_time, end_time)
+        journal = VodJournal(vod_id, start_time, end_time)
+        file_name = journal.resumable_file_name(len(vod_segments))
+        if file_name:
+            Log.info('Resuming ' + file_name)
+        else:
+            title = await self.__title_of(vod_id)
+            if title is None:
+                raise ValueError("Seems like vod {} doesn't exist".format(vod_id))
+            file_name = FileMaker.make_avoiding_overwrite(title + '.ts')
+            journal.start(file_name, len(vod_segments))
+        downloader = VodDownloader(
+            vod_segments,
+            journal,
+            ConcurrencyController(self.__options.min_concurrency, self.__options.max_concurrency),
+            self.__download_slots,
+            self.__shared_terminal
+        )
+        self.__downloaders.append(downloader)
+        # stop() may have run while the playlist was fetched, before this downloader was known
+        if self.__stopped:
+            downloader.stop()
+        await downloader.download_to(file_name)
+
+    def stop(self):
+        self.__stopped = True
+        for downloader in self.__downloaders:
+            downloader.stop()
+
+
 async def main():
-    (start_time, end_time, vod_id) = CommandLineParser().parse_command_line()
-    m3u8_playlist = PlaylistFetcher().fetch_for_vod(vod_id)
-    if m3u8_playlist is None:
-        Log.fatal("Seems like vod {} doesn't exist".format(vod_id))
-    vod_segments = Chunks.get(m3u8_playlist.segments, start_time, end_time)
-    file_name = FileMaker.make_avoiding_overwrite(Vod.title(vod_id) + '.ts')
-    downloader = VodDownloader(vod_segments)
-    signal.signal(signal.SIGINT, lambda sig, frame: downloader.stop())
-    await downloader.download_to(file_name)
+    vods, options = CommandLineParser().parse_command_line()
+    Metrics().configure(options.events, options.metrics_file)
+    batch = VodBatch(options)
+    signal.signal(signal.SIGINT, lambda sig, frame: batch.stop())
+    try:
+        succeeded = await batch.download(vods)
+    finally:
+        Metrics().close()
+    if not succeeded:
+        exit(1)
 
 
 if __name__ == '__main__':
@@ -4,22 +4,27 @@ from argparse import ArgumentParser
 from sys import stdin, stderr, stdout
 
 from twitch.constants import Twitch
+from twitch.helix import Helix, raise_error
+from twitch.video_index import VideoIndex
 from util.auth_header_provider import AuthHeaderProvider
-from util.contents import Contents
+from util.contents import ContentError
 
 
 def main():
     try:
         args = parse_args()
-        user_id = cmdline_or_stdin(args.user_id)
-        search_string = cmdline_or_stdin(args.search_string)
         attribute_names = args.name
-        videos = matching_videos_of(user_id, search_string, attribute_names)
+        if args.ids:
+            videos = videos_by_id(video_ids_from_stdin())
+        else:
+            user_id = cmdline_or_stdin(args.user_id)
+            search_string = cmdline_or_stdin(args.search_string)
+            videos = matching_videos_of(user_id, search_string, attribute_names, args.offline, args.rebuild)
         if args.list_attributes:
-            list_attributes_of(videos[0])
+            list_attributes_of(next(iter(videos)))
         else:
             print_attributes(videos, attribute_names)
-    except ValueError as error:
+    except (ValueError, ContentError) as error:
         stderr.write(str(error) + os.linesep)
         exit(1)
 
@@ -28,6 +33,10 @@ def cmdline_or_stdin(arg):
     return arg if arg else stdin.readline().strip()
 
 
+def video_ids_from_stdin():
+    return [line.split('|')[0].strip() for line in stdin if line.strip()]
+
+
 def parse_args():
     parser = ArgumentParser(
         description="Search channel's past broadcast by name and any other attribute provided by the '-n' option"
@@ -45,6 +54,25 @@ def parse_args():
         action='append',
         default=[]
     )
+    parser.add_argument(
+        '-i',
+        '--ids',
+        help='look videos up by the ids read from stdin (one per line) instead of searching',
+        action='store_true',
+        default=False
+    )
+    parser.add_argument(
+        '--offline',
+        help='search the local video index without checking for new videos',
+        action='store_true',
+        default=False
+    )
+    parser.add_argument(
+        '--rebuild',
+        help='fetch the whole video list again, e.g. to pick up renamed or deleted videos',
+        action='store_true',
+        default=False
+    )
     parser.add_argument(
         '-l',
         '--list-attributes',
@@ -57,35 +85,39 @@ def parse_args():
     return args
 
 
-def matching_videos_of(user_id, search_string, attribute_names):
+def matching_videos_of(user_id, search_string, attribute_names, offline=False, rebuild=False):
     token = search_string.strip().lower()
-    attributes = set(attribute_names)
-
-    def matches(video):
-        return True in [
-            token in video[attribute].strip().lower()
-            for attribute in
-            attributes
-        ]
-
-    videos = videos_of(user_id)
-    matched_videos = list(filter(matches, videos))
+    index = VideoIndex(user_id)
+    try:
+        if rebuild:
+            index.rebuild(videos_of(user_id))
+        elif not offline:
+            index.refresh(videos_of(user_id))
+        matched_videos = index.search(token, sorted(set(attribute_names)))
+    finally:
+        index.close()
     if len(matched_videos) == 0:
         raise ValueError('No matching videos found!')
     return matched_videos
 
 
-def videos_of(user_id):
-    auth_header = AuthHeaderProvider.authenticate()
+def videos_by_id(video_ids):
+    if len(video_ids) == 0:
+        raise ValueError('No video ids given!')
+    for video_id, video in Helix.videos_by_id(video_ids):
+        if video is None:
+            raise ValueError('Video {} could not be found!'.format(video_id))
+        yield video
+
 
+def videos_of(user_id):
     def fetch_videos(cursor):
         params = {'user_id': user_id, 'first': 100}
         if cursor:
             params['after'] = cursor
-        response = Contents.json(
+        response = AuthHeaderProvider.json(
             Twitch.videos_url,
             params=params,
-            headers=auth_header,
             onerror=lambda _: raise_error('Failed to get the videos list!')
         )
         video_entries = response['data']
@@ -103,10 +135,6 @@ def videos_of(user_id):
             videos = []
 
 
-def raise_error(message):
-    raise ValueError(message)
-
-
 def list_attributes_of(video):
     for attribute in sorted(video.keys()):
         stdout.write(attribute + os.linesep)
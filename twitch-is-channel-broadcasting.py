@@ -2,12 +2,17 @@
 import sys
 
 from twitch.playlist import Playlist
+from util.contents import ContentError
 
 if (len(sys.argv)) != 2:
     sys.stderr.write('No channel name given!\n')
     sys.exit(1)
 channel_name = sys.argv[1]
-playlist = Playlist().fetch_for_channel(channel_name)
+try:
+    playlist = Playlist().fetch_for_channel(channel_name)
+except ContentError as error:
+    sys.stderr.write(str(error) + '\n')
+    sys.exit(1)
 if playlist is None:
     sys.exit(1)
 
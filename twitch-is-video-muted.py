@@ -1,26 +1,103 @@
 #!/usr/bin/env python3
+import asyncio
 import os
 import sys
+from argparse import ArgumentParser
 
 from twitch.playlist import Playlist
+from util.asynccontents import AsyncContents
 
 
 def main():
-    try:
-        video_id = sys.argv[1] if len(sys.argv) > 1 else sys.stdin.readline().strip()
-        playlist = playlist_for(video_id)
-        exit(0) if is_muted(playlist) else exit(1)
-    except ValueError as error:
-        sys.stderr.write(str(error) + os.linesep)
+    args = parse_args()
+    video_ids = args.video_id or video_ids_from_stdin()
+    if len(video_ids) == 0:
+        sys.stderr.write('No video ids given!' + os.linesep)
         exit(2)
+    if len(video_ids) == 1 and not args.report:
+        exit(asyncio.run(exit_status_for(video_ids[0])))
+    asyncio.run(report(video_ids, args.parallel))
 
 
-def playlist_for(video_id):
-    return Playlist().fetch_for_vod(video_id)
+def parse_args():
+    parser = ArgumentParser(
+        description='Check whether videos have muted parts. '
+                    'A single video is answered with the exit status: '
+                    '0 if muted, 1 if not and 2 on errors. '
+                    'Several videos are reported as id|status|muted ranges lines.'
+    )
+    parser.add_argument('video_id', nargs='*', help='read from stdin, one per line, if not given')
+    parser.add_argument(
+        '-r',
+        '--report',
+        help='print the report line even for a single video',
+        action='store_true',
+        default=False
+    )
+    parser.add_argument(
+        '-j',
+        '--parallel',
+        metavar='COUNT',
+        help='videos checked at once (defaults to 8)',
+        type=int,
+        default=8
+    )
+    return parser.parse_args()
 
 
-def is_muted(playlist):
-    return any(map(lambda segment: segment.uri.endswith('muted.ts'), playlist.segments))
+def video_ids_from_stdin():
+    return [line.split('|')[0].strip() for line in sys.stdin if line.strip()]
+
+
+async def exit_status_for(video_id):
+    async with AsyncContents():
+        try:
+            playlist = await playlist_for(video_id)
+        except Exception as error:
+            sys.stderr.write(str(error) + os.linesep)
+            return 2
+    return 0 if len(playlist.muted_ranges()) != 0 else 1
+
+
+# lines are printed in input order while later videos are still being fetched
+async def report(video_ids, parallel):
+    slots = asyncio.Semaphore(parallel)
+
+    async def checked(video_id):
+        async with slots:
+            try:
+                return await playlist_for(video_id), None
+            except Exception as error:
+                return None, error
+
+    async with AsyncContents():
+        checks = [asyncio.ensure_future(checked(video_id)) for video_id in video_ids]
+        for video_id, check in zip(video_ids, checks):
+            playlist, error = await check
+            sys.stdout.write(report_line(video_id, playlist, error) + os.linesep)
+            sys.stdout.flush()
+
+
+def report_line(video_id, playlist, error):
+    if error is not None:
+        return '|'.join([video_id, 'error', str(error)])
+    muted_ranges = playlist.muted_ranges()
+    status = 'muted' if len(muted_ranges) != 0 else 'not muted'
+    ranges = ','.join('{}-{}'.format(timestamp(start), timestamp(end)) for start, end in muted_ranges)
+    return '|'.join([video_id, status, ranges])
+
+
+def timestamp(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '{}:{:02}:{:02}'.format(hours, minutes, seconds)
+
+
+async def playlist_for(video_id):
+    playlist = await Playlist.fetch_vod_playlist_async(video_id)
+    if playlist is None:
+        raise ValueError("Seems like video {} doesn't exist".format(video_id))
+    return playlist
 
 
 if __name__ == '__main__':
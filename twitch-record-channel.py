@@ -1,19 +1,47 @@
 #!/usr/bin/env python3
 
+import asyncio
 import signal
-import sys
+from argparse import ArgumentParser
 
-from twitch.recorder import Recorder
+from twitch.recorder import ChannelOfflineException, Recorder
+from twitch.recording_output import RecordingOutput
+from util.contents import ContentError
 from util.log import Log
 
 
+def parse_args():
+    parser = ArgumentParser(description='Record a live channel until the broadcast ends')
+    parser.add_argument('channel_name')
+    parser.add_argument(
+        '--part-size',
+        metavar='MB',
+        help='start a new numbered part once a recording part would grow beyond MB',
+        type=int
+    )
+    parser.add_argument(
+        '--part-minutes',
+        metavar='MINUTES',
+        help='start a new numbered part after MINUTES of stream',
+        type=int
+    )
+    parser.add_argument(
+        '--index',
+        help='keep an m3u8 index of the completed parts next to the recording',
+        action='store_true',
+        default=False
+    )
+    return parser.parse_args()
+
+
 def main():
-    if (len(sys.argv)) != 2:
-        Log.fatal('Needs channel to record!')
-    channel_name = sys.argv[1]
-    recorder = Recorder()
+    args = parse_args()
+    recorder = Recorder(output_factory=RecordingOutput.factory(args.part_size, args.part_minutes, args.index))
     signal.signal(signal.SIGINT, lambda sig, frame: recorder.stop())
-    recorder.record(channel_name)
+    try:
+        asyncio.run(recorder.record(args.channel_name))
+    except (ChannelOfflineException, ContentError, ValueError) as e:
+        Log.fatal(str(e))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import asyncio
+import signal
+from argparse import ArgumentParser
+
+from twitch.recording_daemon import RecordingDaemon
+from twitch.recording_output import RecordingOutput
+from util.metrics import Metrics
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Record every channel listed in the config file, one per line. '
+                    'The file is re-read while running to add or remove channels.'
+    )
+    parser.add_argument('config_file')
+    parser.add_argument(
+        '-d',
+        '--max-downloads',
+        metavar='COUNT',
+        help='segment downloads running at once across all channels (defaults to 32)',
+        type=int,
+        default=32
+    )
+    parser.add_argument(
+        '--part-size',
+        metavar='MB',
+        help='start a new numbered part once a recording part would grow beyond MB',
+        type=int
+    )
+    parser.add_argument(
+        '--part-minutes',
+        metavar='MINUTES',
+        help='start a new numbered part after MINUTES of stream',
+        type=int
+    )
+    parser.add_argument(
+        '--index',
+        help='keep an m3u8 index of the completed parts next to each recording',
+        action='store_true',
+        default=False
+    )
+    parser.add_argument(
+        '--events',
+        metavar='FILE',
+        help='append a JSON line per request, retry and segment to FILE'
+    )
+    parser.add_argument(
+        '--metrics-file',
+        metavar='FILE',
+        help='keep Prometheus text format metrics in FILE, rewritten every few seconds'
+    )
+    parser.add_argument(
+        '--metrics-port',
+        metavar='PORT',
+        help='serve Prometheus text format metrics on http://127.0.0.1:PORT/metrics',
+        type=int
+    )
+    return parser.parse_args()
+
+
+async def record(daemon):
+    asyncio.get_event_loop().add_signal_handler(signal.SIGINT, daemon.stop)
+    await daemon.run()
+
+
+def main():
+    args = parse_args()
+    Metrics().configure(args.events, args.metrics_file)
+    try:
+        asyncio.run(record(RecordingDaemon(
+            args.config_file,
+            args.max_downloads,
+            args.metrics_port,
+            RecordingOutput.factory(args.part_size, args.part_minutes, args.index)
+        )))
+    finally:
+        Metrics().close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from twitch.constants import Twitch
+from util.auth_header_provider import AuthHeaderProvider
+
+
+def raise_error(message):
+    raise ValueError(message)
+
+
+# Helix accepts up to 100 ids or logins per request,
+# lookups are split into such pages which are fetched concurrently
+class Helix:
+    __page_size = 100
+    __parallel_pages = 4
+
+    @classmethod
+    def users_by_login(cls, logins):
+        return cls.__lookup(Twitch.users_url, 'login', 'login', logins, key=str.lower)
+
+    @classmethod
+    def videos_by_id(cls, video_ids):
+        return cls.__lookup(Twitch.videos_url, 'id', 'id', video_ids, key=str)
+
+    # yields (key, entry) pairs in input order, entry is None for unknown keys
+    @classmethod
+    def __lookup(cls, url, param_name, field_name, keys, key):
+        with ThreadPoolExecutor(max_workers=cls.__parallel_pages) as executor:
+            pages = executor.map(
+                lambda page: cls.__fetch_page(url, param_name, field_name, page, key),
+                cls.__pages_of(keys)
+            )
+            for page, entries in pages:
+                for page_key in page:
+                    yield page_key, entries.get(key(page_key))
+
+    @classmethod
+    def __pages_of(cls, keys):
+        keys = iter(keys)
+        while True:
+            page = list(islice(keys, cls.__page_size))
+            if len(page) == 0:
+                return
+            yield page
+
+    @staticmethod
+    def __fetch_page(url, param_name, field_name, page, key):
+        response = AuthHeaderProvider.json(
+            url,
+            params={param_name: [key(page_key) for page_key in page]},
+            onerror=lambda _: raise_error('Failed to look up {}!'.format(url))
+        )
+        return page, {key(entry[field_name]): entry for entry in response['data']}
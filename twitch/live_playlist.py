@@ -0,0 +1,56 @@
+from collections import namedtuple
+
+from twitch.constants import Twitch
+
+LiveSegment = namedtuple('LiveSegment', 'sequence uri duration title')
+
+
+# reads just what polling a live stream needs, segments up to
+# an already seen sequence number are only counted, never built
+class LivePlaylist:
+    __extinf = '#EXTINF:'
+    __media_sequence = '#EXT-X-MEDIA-SEQUENCE:'
+    __target_duration = '#EXT-X-TARGETDURATION:'
+
+    def __init__(self, media_sequence=0, target_duration=None, segment_count=0,
+                 live_segment_count=0, new_segments=()):
+        self.media_sequence = media_sequence
+        self.target_duration = target_duration
+        self.segment_count = segment_count
+        self.live_segment_count = live_segment_count
+        self.new_segments = new_segments
+
+    def last_sequence(self):
+        return self.media_sequence + self.segment_count - 1
+
+    @classmethod
+    def parse(cls, raw_playlist, after_sequence=None):
+        media_sequence = 0
+        target_duration = None
+        segment_count = 0
+        live_segment_count = 0
+        new_segments = []
+        duration = None
+        title = None
+        for line in raw_playlist.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if line[0] != '#':
+                if duration is None:
+                    continue
+                sequence = media_sequence + segment_count
+                segment_count += 1
+                if title == Twitch.stream_segment_title:
+                    live_segment_count += 1
+                if after_sequence is None or sequence > after_sequence:
+                    new_segments.append(LiveSegment(sequence, line, duration, title))
+                duration = None
+            elif line.startswith(cls.__extinf):
+                duration, _, title = line[len(cls.__extinf):].partition(',')
+                duration = float(duration)
+            elif line.startswith(cls.__media_sequence):
+                media_sequence = int(line[len(cls.__media_sequence):])
+            elif line.startswith(cls.__target_duration):
+                target_duration = int(float(line[len(cls.__target_duration):]))
+        return cls(media_sequence, target_duration, segment_count, live_segment_count, new_segments)
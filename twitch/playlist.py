@@ -2,7 +2,11 @@ import m3u8
 from m3u8 import M3U8
 
 from twitch.constants import Twitch
+from twitch.live_playlist import LivePlaylist
 from twitch.token import Token
+from twitch.vod_playlist import VodPlaylist
+from util.asynccontents import AsyncContents, ResponseError
+from util.background import in_background
 from util.contents import Contents
 from util.persistent_resource import PersistentJsonResource
 
@@ -15,6 +19,26 @@ class Playlist:
         self.__best_quality_link_resource = None
 
     def fetch_for_channel(self, channel_name):
+        link = self.__media_playlist_link_for(channel_name)
+        if not link:
+            return M3U8(None)
+        return self.fetch_playlist(link)
+
+    # None when the channel's playlist can't be fetched, e.g. once it went offline.
+    # Expects to run within an entered AsyncContents, only finding a new link blocks
+    async def fetch_live_for_channel_async(self, channel_name, after_sequence=None):
+        link = await in_background(self.__media_playlist_link_for, channel_name)
+        raw_playlist = await self.__fetch_raw_async(link) if link else None
+        if raw_playlist is None and link:
+            # signed links expire, a fresh one tells that apart from the stream being gone
+            self.__best_quality_link_resource.clear()
+            link = await in_background(self.__media_playlist_link_for, channel_name)
+            raw_playlist = await self.__fetch_raw_async(link) if link else None
+        if raw_playlist is None:
+            return None
+        return LivePlaylist.parse(raw_playlist, after_sequence)
+
+    def __media_playlist_link_for(self, channel_name):
         if not self.__best_quality_link_resource:
             self.__best_quality_link_resource = PersistentJsonResource(
                 self.__playlist_link_file.format(channel_name)
@@ -22,41 +46,81 @@ class Playlist:
             if self.__best_quality_link_resource.value():
                 self.__try_playlist_link()
         if not self.__best_quality_link_resource.value():
-            return self.__fetch_new(channel_name)
-        return self.fetch_playlist(self.__best_quality_link_resource.value())
+            self.__fetch_new_link(channel_name)
+        return self.__best_quality_link_resource.value()
 
     def __try_playlist_link(self):
-        playlist = self.fetch_playlist(self.__best_quality_link_resource.value())
-        if len(playlist.segments) == 0:
+        playlist = self.fetch_live_playlist(self.__best_quality_link_resource.value())
+        if playlist.segment_count == 0:
             self.__best_quality_link_resource.clear()
 
-    def __fetch_new(self, channel_name):
+    def __fetch_new_link(self, channel_name):
         token = self.__token.fetch_for_channel(channel_name)
         playlist_link = Twitch.channel_playlist_link.format(channel_name)
-        return self.__fetch_playlist(playlist_link, token)
-
-    def __fetch_playlist(self, playlist_link, token):
         playlist_container = self.fetch_playlist(playlist_link, token)
-        if len(playlist_container.playlists) == 0:
-            return playlist_container
-        self.__best_quality_link_resource.store(playlist_container.playlists[0].uri)
-        return self.fetch_playlist(self.__best_quality_link_resource.value())
+        if len(playlist_container.playlists) != 0:
+            self.__best_quality_link_resource.store(playlist_container.playlists[0].uri)
+
+    @classmethod
+    def fetch_playlist(cls, link, token=None):
+        raw_playlist = cls.__fetch_raw(link, token)
+        if raw_playlist is None:
+            return M3U8(None)
+        return m3u8.loads(raw_playlist)
+
+    @classmethod
+    def fetch_live_playlist(cls, link, after_sequence=None):
+        raw_playlist = cls.__fetch_raw(link)
+        if raw_playlist is None:
+            return LivePlaylist()
+        return LivePlaylist.parse(raw_playlist, after_sequence)
+
+    @classmethod
+    def __fetch_raw(cls, link, token=None):
+        return Contents.utf8(link, params=cls.__params_for(token), onerror=lambda _: None)
+
+    @staticmethod
+    async def __fetch_raw_async(link):
+        try:
+            return await AsyncContents().utf8(link)
+        except ResponseError:
+            return None
 
     @staticmethod
-    def fetch_playlist(link, token=None):
+    def __params_for(token):
         params = {'allow_source': 'true'} if token else {}
         params.update(
             {'token': token['token'], 'sig': token['sig']} if token else {}
         )
-        raw_playlist = Contents.utf8(link, params=params, onerror=lambda _: None)
+        return params
+
+    def fetch_vod_playlist(self, vod_id):
+        link = self.__vod_media_playlist_link(vod_id)
+        if not link:
+            return None
+        raw_playlist = self.__fetch_raw(link)
         if raw_playlist is None:
-            return M3U8(None)
-        return m3u8.loads(raw_playlist)
+            return None
+        return VodPlaylist.parse(raw_playlist, link.rsplit('/', 1)[0])
+
+    # expects to run within an entered AsyncContents
+    @classmethod
+    async def fetch_vod_playlist_async(cls, vod_id):
+        contents = AsyncContents()
+        token = await Token.fetch_for_vod_async(vod_id)
+        playlist_container = m3u8.loads(await contents.utf8(
+            Twitch.vod_playlist_link.format(vod_id),
+            params=cls.__params_for(token)
+        ))
+        if len(playlist_container.playlists) == 0:
+            return None
+        link = playlist_container.playlists[0].uri
+        return VodPlaylist.parse(await contents.utf8(link), link.rsplit('/', 1)[0])
 
-    def fetch_for_vod(self, vod_id):
+    def __vod_media_playlist_link(self, vod_id):
         token = Token.fetch_for_vod(vod_id)
         playlist_link = Twitch.vod_playlist_link.format(vod_id)
-        self.__best_quality_link_resource = PersistentJsonResource('/dev/null')
-        playlist = self.__fetch_playlist(playlist_link, token)
-        playlist.base_path = self.__best_quality_link_resource.value().rsplit('/', 1)[0]
-        return playlist
+        playlist_container = self.fetch_playlist(playlist_link, token)
+        if len(playlist_container.playlists) == 0:
+            return None
+        return playlist_container.playlists[0].uri
@@ -0,0 +1,61 @@
+from time import time
+
+
+# follows the HLS reload rules: wait about one segment after new ones appeared,
+# half of that right after a poll brought nothing new and back off while idle or during ads
+class PollScheduler:
+    __default_target_duration = 2
+    __min_interval = 0.5
+    __cadence_smoothing = 0.3
+    __idle_slowdown = 2
+    __idle_segments = 2
+    __stall_segments = 6
+    __min_stall_seconds = 15
+
+    def __init__(self):
+        self.__target_duration = self.__default_target_duration
+        self.__cadence = None
+        self.__last_new_segment_time = None
+        self.__stalled_since = time()
+        self.__missed = False
+        self.__ad_running = False
+
+    def on_segments(self, target_duration, new_segment_count):
+        now = time()
+        if target_duration:
+            self.__target_duration = target_duration
+        self.__ad_running = False
+        self.__missed = new_segment_count == 0
+        if self.__missed:
+            return
+        # the first poll returns the whole playlist window, which says nothing about the cadence
+        if self.__last_new_segment_time is not None:
+            self.__track_cadence((now - self.__last_new_segment_time) / new_segment_count)
+        self.__last_new_segment_time = now
+        self.__stalled_since = now
+
+    def __track_cadence(self, cadence):
+        if self.__cadence is None:
+            self.__cadence = cadence
+        else:
+            self.__cadence += self.__cadence_smoothing * (cadence - self.__cadence)
+
+    def on_ad(self):
+        self.__ad_running = True
+        self.__last_new_segment_time = None
+        self.__stalled_since = time()
+
+    def interval(self):
+        interval = min(self.__cadence or self.__target_duration, self.__target_duration)
+        if self.__ad_running or self.__idle():
+            interval *= self.__idle_slowdown
+        elif self.__missed:
+            interval /= 2
+        return max(interval, self.__min_interval)
+
+    def __idle(self):
+        return time() - self.__stalled_since > self.__idle_segments * self.__target_duration
+
+    def stalled(self):
+        stall_seconds = max(self.__stall_segments * self.__target_duration, self.__min_stall_seconds)
+        return time() - self.__stalled_since > stall_seconds
@@ -1,27 +1,111 @@
-import os
+import shutil
+import signal
+from collections import deque
 from sys import stdout
+from time import monotonic
 
 
 class ProgressBar:
-    def __init__(self, file_name, total_segments):
+    __redraw_interval = 0.1
+    __log_interval = 10
+    __speed_window_seconds = 5
+    __console_width = None
+    __watching_resizes = False
+
+    # bars sharing the terminal with other downloads would overwrite each other's line,
+    # so they log a line now and then like when not attached to a terminal
+    def __init__(self, file_name, total_segments, in_flight=lambda: 0, shared_terminal=False):
         self.fileName = file_name
         self.total = total_segments
         self.current = 0
+        self.size = 0
+        self.__in_flight = in_flight
+        self.__is_tty = stdout.isatty() and not shared_terminal
+        self.__last_drawn = None
+        self.__samples = deque()
+        self.__watch_resizes()
         self.update_by(0)
 
-    def update_by(self, count):
+    # segments counted before the first transfer, e.g. when resuming, don't make up any speed
+    def skip(self, count, size=0):
         self.current += count
-        percent_completed = self.current / self.total * 100
-        self.__print_bar(percent_completed)
+        self.size += size
+        self.__samples.clear()
+        self.update_by(0)
+
+    def update_by(self, count, size=0):
+        self.current += count
+        self.size += size
+        now = monotonic()
+        self.__sample(now)
+        finished = self.current == self.total
+        interval = self.__redraw_interval if self.__is_tty else self.__log_interval
+        if finished or self.__last_drawn is None or now - self.__last_drawn >= interval:
+            self.__last_drawn = now
+            self.__print_bar(finished)
+
+    def __sample(self, now):
+        self.__samples.append((now, self.current, self.size))
+        while len(self.__samples) > 2 and now - self.__samples[1][0] >= self.__speed_window_seconds:
+            self.__samples.popleft()
 
-    def __print_bar(self, percent_completed):
-        stdout.write('\r' + ' ' * self.__get_console_width())
-        stdout.write('\r{file} [{percents:3.0f}%]{terminator}'.format(
+    # segments and bytes per second over the last few seconds
+    def __speed(self):
+        if len(self.__samples) < 2:
+            return 0, 0
+        (first_time, first_count, first_size), (last_time, last_count, last_size) = \
+            self.__samples[0], self.__samples[-1]
+        seconds = last_time - first_time
+        if seconds <= 0:
+            return 0, 0
+        return (last_count - first_count) / seconds, (last_size - first_size) / seconds
+
+    def __print_bar(self, finished):
+        segments_per_second, bytes_per_second = self.__speed()
+        remaining = self.total - self.current
+        eta = self.__duration(remaining / segments_per_second) if segments_per_second else '--:--:--'
+        line = '{file} [{percents:3.0f}%] {size:.1f} MB {speed:.1f} MB/s ETA {eta} {in_flight} in flight'.format(
             file=self.fileName,
-            percents=percent_completed,
-            terminator='\n' if self.current == self.total else ''))
+            percents=self.current / self.total * 100 if self.total else 100,
+            size=self.size / 2 ** 20,
+            speed=bytes_per_second / 2 ** 20,
+            eta=eta,
+            in_flight=self.__in_flight(),
+        )
+        if not self.__is_tty:
+            stdout.write(line + '\n')
+        else:
+            width = self.__width() - 1
+            stdout.write('\r' + line[:width].ljust(width) + ('\n' if finished else ''))
+        stdout.flush()
 
     @staticmethod
-    def __get_console_width():
-        _, width = os.popen('stty size', 'r').read().split()
-        return int(width)
+    def __duration(seconds):
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return '{}:{:02}:{:02}'.format(hours, minutes, seconds)
+
+    @classmethod
+    def __width(cls):
+        if cls.__console_width is None:
+            cls.__console_width = shutil.get_terminal_size().columns
+        return cls.__console_width
+
+    # the width is asked for once and again only after the terminal got resized
+    @classmethod
+    def __watch_resizes(cls):
+        if cls.__watching_resizes or not hasattr(signal, 'SIGWINCH'):
+            return
+        cls.__watching_resizes = True
+        previous_handler = signal.getsignal(signal.SIGWINCH)
+
+        def on_resize(signum, frame):
+            cls.__console_width = None
+            if callable(previous_handler):
+                previous_handler(signum, frame)
+
+        try:
+            signal.signal(signal.SIGWINCH, on_resize)
+        except ValueError:
+            # not on the main thread, the width stays as first read
+            pass
@@ -0,0 +1,34 @@
+import asyncio
+
+
+class ReassemblyBuffer:
+    def __init__(self, writer, memory_budget, on_written):
+        self.__writer = writer
+        self.__memory_budget = memory_budget
+        self.__on_written = on_written
+        self.__pending = {}
+        self.__buffered_size = 0
+        self.__next_index = 0
+        self.__changed = asyncio.Condition()
+
+    # the next segment to be written is always let through,
+    # otherwise a full buffer could never drain
+    async def reserve(self, index):
+        async with self.__changed:
+            await self.__changed.wait_for(
+                lambda: index == self.__next_index or self.__buffered_size < self.__memory_budget
+            )
+
+    async def commit(self, index, data):
+        async with self.__changed:
+            self.__pending[index] = data
+            self.__buffered_size += len(data)
+            await self.__write_ready()
+            self.__changed.notify_all()
+
+    async def __write_ready(self):
+        while self.__next_index in self.__pending:
+            data = self.__pending.pop(self.__next_index)
+            self.__buffered_size -= len(data)
+            self.__next_index += 1
+            await self.__writer.write(data, self.__on_written)
@@ -1,152 +1,189 @@
-import itertools
-import pickle
+import asyncio
 import uuid
-from collections import deque
-from time import sleep
+from time import time
 
 from twitch.constants import Twitch
 from twitch.playlist import Playlist
+from twitch.poll_scheduler import PollScheduler
+from twitch.recording_output import RecordingOutput
+from twitch.sequence_tracker import SequenceTracker
+from util.asynccontents import AsyncContents
 from util.auth_header_provider import AuthHeaderProvider
-from util.contents import Contents
-from util.file import File
+from util.background import in_background
 from util.log import Log
+from util.metrics import Metrics
+from util.retry import NO_RETRY, RetryBudget
 from util.stopwatch import Stopwatch
 
 
+class ChannelOfflineException(Exception):
+    pass
+
+
 class Recorder:
-    def __init__(self):
+    __download_concurrency = 4
+    __retry_budget = 30
+    __retry_refill_seconds = 5
+
+    def __init__(self, download_slots=None, output_factory=RecordingOutput):
         self.__recording = True
-        self.__downloaded = None
-        self.__buffer_file_name = None
+        self.__download_slots = download_slots
+        self.__sequence_tracker = None
         self.__stopwatch = Stopwatch()
-        self.__sleep_seconds = 5
-        self.__file_name = uuid.uuid4().hex + '.ts'
+        self.__poll_scheduler = PollScheduler()
+        self.__output = output_factory(uuid.uuid4().hex)
         self.__stream_name = None
         self.__playlist = Playlist()
-
-    def record(self, channel):
-        consecutive_times_received_no_new_segments = 0
-        notified_about_running_ad = False
-        self.__init_segments_buffer(channel)
-        while self.__recording:
-            self.__stopwatch.split()
-            ad_running, segments = self.__fetch_segments(channel)
-            if not ad_running:
-                if len(segments) == 0:
-                    if len(self.__downloaded) == 0:
-                        Log.fatal('Seems like the channel is offline')
-                    break
-                new_segments = self.__only_new(segments)
-                if len(new_segments) != 0:
-                    consecutive_times_received_no_new_segments = 0
-                    self.__write(new_segments)
-                    self.__check_if_segments_lost(segments)
-                    self.__store_downloaded(new_segments)
-                else:
-                    consecutive_times_received_no_new_segments += 1
-                    if consecutive_times_received_no_new_segments == 3:
-                        break
-                self.__rename_recording_if_stream_name_became_known_for(channel)
-            elif not notified_about_running_ad:
-                Log.info('Waiting for an ad to stop')
-                notified_about_running_ad = True
-            self.__sleep_if_needed()
-        self.__store_segments_buffer()
+        self.__retry_policy = AsyncContents().retry_policy().with_budget(
+            RetryBudget(self.__retry_budget, self.__retry_refill_seconds)
+        )
+        self.__channel = None
+
+    async def record(self, channel):
+        self.__channel = channel
+        self.__sequence_tracker = SequenceTracker(channel)
+        async with AsyncContents():
+            downloads = asyncio.Queue()
+            writer = asyncio.ensure_future(self.__write_in_order(downloads))
+            try:
+                await self.__poll(channel, downloads)
+            finally:
+                await downloads.put(None)
+                await writer
+                self.__output.close()
         if self.__recording:
             Log.info('Broadcast ended.')
         else:
             Log.info('Stopped.')
 
-    def __init_segments_buffer(self, channel_name):
-        self.__buffer_file_name = f'{File.user_cache_dir()}/twitch-dl/{channel_name}.buff'
-        self.__downloaded = self.__load_buffer_from_file(self.__buffer_file_name)
-
-    @staticmethod
-    def __load_buffer_from_file(file_name):
-        if File.exists(file_name) and not File.age_in_seconds(file_name) > 60:
-            with open(file_name, 'rb') as buffer_file:
-                return pickle.load(buffer_file)
-        return deque(maxlen=32)
-
     @staticmethod
     def __lookup_stream_name(channel):
-        response = Contents.json(
+        response = AuthHeaderProvider.json(
             Twitch.stream_link,
             params={'user_login': channel},
-            headers=AuthHeaderProvider.authenticate(),
+            onerror=lambda _: None,
         )
-        if response['data'] is None or len(response['data']) == 0:
+        if response is None or response['data'] is None or len(response['data']) == 0:
             return None
         return response['data'][0]['title']
 
+    # polling only schedules downloads, so discovering the next segments
+    # never waits for a slow one to finish
+    async def __poll(self, channel, downloads):
+        notified_about_running_ad = False
+        download_slots = self.__download_slots or asyncio.Semaphore(self.__download_concurrency)
+        while self.__recording:
+            self.__stopwatch.split()
+            playlist = await self.__playlist.fetch_live_for_channel_async(
+                channel,
+                self.__sequence_tracker.last_sequence()
+            )
+            Metrics().count('playlist_polls_total', channel=channel)
+            if not self.__sequence_tracker.has_seen_any() and (playlist is None or playlist.segment_count == 0):
+                raise ChannelOfflineException('Seems like the channel is offline')
+            if playlist is None:
+                break
+            ad_running = playlist.segment_count != 0 and playlist.live_segment_count == 0
+            if not ad_running:
+                # a playlist that briefly comes back empty is waited out until it counts as stalled
+                if playlist.live_segment_count != 0:
+                    self.__check_if_segments_lost(playlist)
+                new_segments = list(
+                    filter(lambda s: s.title == Twitch.stream_segment_title, playlist.new_segments))
+                self.__poll_scheduler.on_segments(playlist.target_duration, len(new_segments))
+                if len(new_segments) != 0:
+                    for segment in new_segments:
+                        download = asyncio.ensure_future(self.__download(segment.uri, download_slots))
+                        await downloads.put((download, time(), segment.duration, segment.sequence))
+                    # ad segments in between are skipped once the live ones before them are written
+                    await downloads.put((None, time(), 0, playlist.last_sequence()))
+                    Metrics().gauge('recording_pending_segments', downloads.qsize(), channel=channel)
+                    self.__sequence_tracker.schedule_up_to(playlist.last_sequence())
+                elif self.__poll_scheduler.stalled():
+                    break
+                await self.__rename_recording_if_stream_name_became_known_for(channel)
+            else:
+                # ad segments count as seen, so skipping them is not reported as a loss
+                await downloads.put((None, time(), 0, playlist.last_sequence()))
+                self.__sequence_tracker.schedule_up_to(playlist.last_sequence())
+                self.__poll_scheduler.on_ad()
+                if not notified_about_running_ad:
+                    Log.info('Waiting for an ad to stop')
+                    notified_about_running_ad = True
+            await self.__sleep_if_needed()
+
+    # retried as a whole, a connection lost mid-body would otherwise lose the segment
+    async def __download(self, uri, download_slots):
+        async with download_slots:
+            stopwatch = Stopwatch()
+            data = await self.__retry_policy.call_async(lambda: self.__fetch(uri))
+            seconds = stopwatch.split()
+        Metrics().count('segments_total', source='live')
+        Metrics().count('segment_bytes_total', len(data), source='live')
+        Metrics().observe('segment_seconds', seconds, source='live')
+        Metrics().event('segment', source='live', channel=self.__channel, uri=uri,
+                        bytes=len(data), seconds=round(seconds, 4))
+        return data
+
     @staticmethod
-    def __next_vacant(stream_name, extension):
-        new_name = stream_name
-        for i in itertools.count(1):
-            if not File.isfile(new_name + extension):
-                return new_name + extension
-            new_name = f'{stream_name} {i:02}'
-
-    def __fetch_segments(self, channel):
-        playlist = self.__playlist.fetch_for_channel(channel)
-        if playlist is None:
-            return []
-        segments = list(
-            filter(lambda s: s.title == Twitch.stream_segment_title, playlist.segments))
-        if len(playlist.segments) != 0 and len(segments) == 0:
-            return True, []
-        for segment in segments:
-            # taking 10 characters before the common part at the end of the URL
-            segment.title = segment.uri[-29:-19]
-        return False, segments
-
-    def __only_new(self, segments):
-        return list(filter(lambda s: s.title not in self.__downloaded, segments))
-
-    def __check_if_segments_lost(self, segments):
-        if len(self.__downloaded) == 0 or len(segments) == 0:
-            return
-        if segments[0].title not in self.__downloaded:
+    async def __fetch(uri):
+        data = bytearray()
+        async for chunk in await AsyncContents().chunked(uri, retry_policy=NO_RETRY):
+            data += chunk
+        return data
+
+    def __check_if_segments_lost(self, playlist):
+        lost = self.__sequence_tracker.lost_between(playlist.media_sequence, playlist.last_sequence())
+        if len(lost) != 0:
+            Metrics().count('segments_lost_total', len(lost), channel=self.__channel)
+            Metrics().event('segments_lost', channel=self.__channel, first=lost.start, last=lost.stop - 1)
             Log.error('Lost segments detected!')
-            Log.error("The first downloaded segment hasn't been seen before!")
-
-    def __store_downloaded(self, new_segments):
-        for segment in new_segments:
-            self.__downloaded.append(segment.title)
-
-    def __write(self, segments):
-        with open(self.__file_name, 'ab') as file:
-            for segment in segments:
-                for chunk in Contents.chunked(segment.uri):
-                    if chunk:
-                        try:
-                            file.write(chunk)
-                        except IOError as e:
-                            Log.error(str(e))
-
-    def __rename_recording_if_stream_name_became_known_for(self, channel):
+            Log.error(f'Segments {lost.start}-{lost.stop - 1} left the playlist before being seen')
+
+    # downloads are queued in media sequence order,
+    # so awaiting them one by one keeps the recording ordered
+    async def __write_in_order(self, downloads):
+        while True:
+            queued = await downloads.get()
+            if queued is None:
+                return
+            download, discovered_at, seconds, sequence = queued
+            if download is not None:
+                Metrics().gauge('recording_pending_segments', downloads.qsize() + 1, channel=self.__channel)
+                await self.__write_when_downloaded(download, discovered_at, seconds)
+            # a segment that could not be downloaded is reported lost, fetching it again would not help
+            self.__sequence_tracker.advance_to(sequence)
+
+    async def __write_when_downloaded(self, download, discovered_at, seconds):
+        try:
+            data = await download
+        except Exception as e:
+            Log.error('Lost segment: ' + str(e))
+            Metrics().count('segments_lost_total', channel=self.__channel)
+            return
+        self.__write(data, seconds)
+        # how long after showing up in the playlist a segment reached the disk
+        Metrics().gauge('recording_behind_live_seconds', time() - discovered_at, channel=self.__channel)
+
+    def __write(self, data, seconds):
+        try:
+            self.__output.write(data, seconds)
+        except IOError as e:
+            Log.error(str(e))
+
+    async def __rename_recording_if_stream_name_became_known_for(self, channel):
         if self.__stream_name:
             return
-        self.__stream_name = self.__lookup_stream_name(channel)
+        self.__stream_name = await in_background(self.__lookup_stream_name, channel)
         if self.__stream_name is None:
             return
         Log.info('Recording ' + self.__stream_name)
-        old_file_name = self.__file_name
-        self.__file_name = self.__next_vacant(
-            self.__stream_name.strip().replace('/', ''),
-            '.ts'
-        )
-        if File.exists(old_file_name):
-            File.rename(old_file_name, self.__file_name)
+        self.__output.rename_to(self.__stream_name.strip().replace('/', ''))
 
-    def __sleep_if_needed(self):
-        time_to_sleep = self.__sleep_seconds - 2 * self.__stopwatch.split()
+    async def __sleep_if_needed(self):
+        time_to_sleep = self.__poll_scheduler.interval() - self.__stopwatch.split()
         if time_to_sleep > 0:
-            sleep(time_to_sleep)
-
-    def __store_segments_buffer(self):
-        with open(self.__buffer_file_name, 'wb') as buffer_file:
-            pickle.dump(self.__downloaded, buffer_file)
+            await asyncio.sleep(time_to_sleep)
 
     def stop(self):
         self.__recording = False
@@ -0,0 +1,128 @@
+import asyncio
+from os import path
+
+from aiohttp import web
+
+from twitch.recorder import ChannelOfflineException, Recorder
+from twitch.recording_output import RecordingOutput
+from util.asynccontents import AsyncContents
+from util.contents import Contents
+from util.log import Log
+from util.metrics import Metrics
+
+
+class ChannelWatcher:
+    __offline_retry_seconds = 60
+
+    def __init__(self, channel, download_slots, output_factory):
+        self.__channel = channel
+        self.__download_slots = download_slots
+        self.__output_factory = output_factory
+        self.__recorder = None
+        self.__stopped = asyncio.Event()
+
+    # a channel stays watched while it is listed,
+    # every broadcast gets its own recorder and recording
+    async def watch(self):
+        while not self.__stopped.is_set():
+            self.__recorder = Recorder(self.__download_slots, self.__output_factory)
+            try:
+                await self.__recorder.record(self.__channel)
+            except ChannelOfflineException:
+                pass
+            except Exception as e:
+                Log.error(f'Recording {self.__channel} failed: {e}')
+            await self.__wait(self.__offline_retry_seconds)
+
+    async def __wait(self, seconds):
+        try:
+            await asyncio.wait_for(self.__stopped.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def stop(self):
+        self.__stopped.set()
+        if self.__recorder:
+            self.__recorder.stop()
+
+
+class RecordingDaemon:
+    __config_check_seconds = 10
+    # connections beyond the download slots, so playlist polls never queue behind segment downloads
+    __poll_connections = 8
+
+    def __init__(self, config_file_name, max_downloads, metrics_port=None, output_factory=RecordingOutput):
+        self.__config_file_name = path.expanduser(config_file_name)
+        self.__max_downloads = max_downloads
+        self.__metrics_port = metrics_port
+        self.__output_factory = output_factory
+        self.__config_modified = None
+        self.__watchers = {}
+        self.__stopping = []
+        self.__stopped = None
+
+    async def run(self):
+        self.__stopped = asyncio.Event()
+        download_slots = asyncio.Semaphore(self.__max_downloads)
+        Contents.configure(pool_maxsize=self.__max_downloads)
+        AsyncContents().configure(connections=self.__max_downloads + self.__poll_connections)
+        metrics_server = await self.__serve_metrics()
+        try:
+            async with AsyncContents():
+                while not self.__stopped.is_set():
+                    self.__sync_channels(download_slots)
+                    try:
+                        await asyncio.wait_for(self.__stopped.wait(), self.__config_check_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                for watcher, _ in self.__watchers.values():
+                    watcher.stop()
+                await asyncio.gather(*[task for _, task in self.__watchers.values()], *self.__stopping)
+        finally:
+            if metrics_server is not None:
+                await metrics_server.cleanup()
+
+    async def __serve_metrics(self):
+        if self.__metrics_port is None:
+            return None
+        async def metrics(request):
+            return web.Response(text=Metrics().prometheus_text())
+
+        app = web.Application()
+        app.add_routes([web.get('/metrics', metrics)])
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', self.__metrics_port).start()
+        return runner
+
+    def __sync_channels(self, download_slots):
+        channels = self.__read_channels()
+        if channels is None:
+            return
+        for channel in set(self.__watchers) - channels:
+            Log.info(f'Stopped watching {channel}')
+            watcher, task = self.__watchers.pop(channel)
+            watcher.stop()
+            self.__stopping.append(task)
+        for channel in channels - set(self.__watchers):
+            Log.info(f'Watching {channel}')
+            watcher = ChannelWatcher(channel, download_slots, self.__output_factory)
+            self.__watchers[channel] = (watcher, asyncio.ensure_future(watcher.watch()))
+        Metrics().gauge('watched_channels', len(self.__watchers))
+
+    # expecting one channel name per line, lines starting with '#' are ignored
+    def __read_channels(self):
+        try:
+            modified = path.getmtime(self.__config_file_name)
+            if modified == self.__config_modified:
+                return None
+            with open(self.__config_file_name, 'rt') as config:
+                lines = [line.strip() for line in config]
+        except OSError as e:
+            Log.error(str(e))
+            return None
+        self.__config_modified = modified
+        return {line.lower() for line in lines if line and not line.startswith('#')}
+
+    def stop(self):
+        self.__stopped.set()
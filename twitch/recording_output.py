@@ -0,0 +1,111 @@
+import itertools
+import math
+import os
+
+from util.file import File
+
+
+# Without limits a recording is a single '<name>.ts' as before. With a part size or duration
+# it rolls over into '<name> part 001.ts', '<name> part 002.ts' and so on, and the optional
+# '<name>.m3u8' index lists every completed part so they can be processed while recording goes on.
+class RecordingOutput:
+    def __init__(self, base_name, max_part_size=None, max_part_seconds=None, write_index=False):
+        self.__base_name = base_name
+        self.__max_part_size = max_part_size
+        self.__max_part_seconds = max_part_seconds
+        self.__write_index = write_index
+        self.__completed_parts = []
+        self.__file = None
+        self.__part_size = 0
+        self.__part_seconds = 0.0
+
+    @classmethod
+    def factory(cls, part_size_mb=None, part_minutes=None, write_index=False):
+        return lambda base_name: cls(
+            base_name,
+            max_part_size=part_size_mb * 2 ** 20 if part_size_mb else None,
+            max_part_seconds=part_minutes * 60 if part_minutes else None,
+            write_index=write_index
+        )
+
+    def __rolls(self):
+        return self.__max_part_size is not None or self.__max_part_seconds is not None
+
+    def __part_name(self, base_name, number):
+        if not self.__rolls():
+            return base_name + '.ts'
+        return f'{base_name} part {number:03}.ts'
+
+    def __current_part_name(self):
+        return self.__part_name(self.__base_name, len(self.__completed_parts) + 1)
+
+    def __index_name(self, base_name):
+        return base_name + '.m3u8'
+
+    def write(self, data, seconds):
+        if self.__file is not None and self.__is_full_after(len(data), seconds):
+            self.__complete_part()
+        if self.__file is None:
+            self.__file = open(self.__current_part_name(), 'ab')
+        self.__file.write(data)
+        self.__part_size += len(data)
+        self.__part_seconds += seconds
+
+    def __is_full_after(self, size, seconds):
+        return self.__max_part_size is not None and self.__part_size + size > self.__max_part_size \
+            or self.__max_part_seconds is not None and self.__part_seconds + seconds > self.__max_part_seconds
+
+    def __complete_part(self):
+        self.__file.close()
+        self.__file = None
+        self.__completed_parts.append(self.__part_seconds)
+        self.__part_size = 0
+        self.__part_seconds = 0.0
+        self.__update_index()
+
+    def close(self):
+        if self.__file is not None:
+            self.__complete_part()
+        self.__update_index(ended=True)
+
+    def rename_to(self, desired_base_name):
+        base_name = self.__next_vacant(desired_base_name)
+        part_count = len(self.__completed_parts) + (1 if self.__file is not None else 0)
+        for number in range(1, part_count + 1):
+            old_part_name = self.__part_name(self.__base_name, number)
+            if File.exists(old_part_name):
+                # an open part keeps being written to under its new name
+                File.rename(old_part_name, self.__part_name(base_name, number))
+        old_index_name = self.__index_name(self.__base_name)
+        self.__base_name = base_name
+        if File.exists(old_index_name):
+            os.remove(old_index_name)
+            self.__update_index()
+
+    def __next_vacant(self, desired_base_name):
+        base_name = desired_base_name
+        for i in itertools.count(1):
+            if not File.isfile(self.__part_name(base_name, 1)) and not File.isfile(self.__index_name(base_name)):
+                return base_name
+            base_name = f'{desired_base_name} {i:02}'
+
+    def __update_index(self, ended=False):
+        if not self.__write_index or len(self.__completed_parts) == 0:
+            return
+        lines = [
+            '#EXTM3U',
+            '#EXT-X-VERSION:3',
+            '#EXT-X-TARGETDURATION:{}'.format(math.ceil(max(self.__completed_parts))),
+            '#EXT-X-PLAYLIST-TYPE:EVENT',
+            '#EXT-X-MEDIA-SEQUENCE:0',
+        ]
+        for number, seconds in enumerate(self.__completed_parts, 1):
+            lines.append(f'#EXTINF:{seconds:.3f},')
+            lines.append(os.path.basename(self.__part_name(self.__base_name, number)))
+        if ended:
+            lines.append('#EXT-X-ENDLIST')
+        # readers polling the index must never see a half-written one
+        index_name = self.__index_name(self.__base_name)
+        with open(index_name + '.tmp', 'w') as index:
+            index.write('\n'.join(lines) + '\n')
+        os.replace(index_name + '.tmp', index_name)
@@ -0,0 +1,44 @@
+from util.file import File
+from util.persistent_resource import PersistentJsonResource
+
+
+# media sequence numbers only ever grow within a broadcast,
+# so everything up to the last seen number is known to be handled
+class SequenceTracker:
+    __state_max_age_seconds = 60
+
+    def __init__(self, channel_name):
+        state_file_name = f'{File.user_cache_dir()}/twitch-dl/{channel_name}-sequence.json'
+        self.__state_resource = PersistentJsonResource(state_file_name, self.__state_max_age_seconds)
+        state = self.__state_resource.value()
+        self.__written_sequence = state['last_sequence'] if state else None
+        self.__scheduled_sequence = self.__written_sequence
+
+    def has_seen_any(self):
+        return self.__scheduled_sequence is not None
+
+    def lost_between(self, first_sequence, last_sequence):
+        if self.__scheduled_sequence is None:
+            return range(0)
+        if last_sequence < self.__scheduled_sequence:
+            # the numbering restarted, so this is a new broadcast
+            self.__scheduled_sequence = None
+            self.__written_sequence = None
+            return range(0)
+        return range(self.__scheduled_sequence + 1, first_sequence)
+
+    def last_sequence(self):
+        return self.__scheduled_sequence
+
+    # polling moves on once segments are scheduled, but only written
+    # segments are remembered, so a restart fetches the rest again
+    def schedule_up_to(self, sequence):
+        if self.__scheduled_sequence is None or sequence > self.__scheduled_sequence:
+            self.__scheduled_sequence = sequence
+
+    def advance_to(self, sequence):
+        self.schedule_up_to(sequence)
+        if self.__written_sequence is not None and sequence <= self.__written_sequence:
+            return
+        self.__written_sequence = sequence
+        self.__state_resource.store({'last_sequence': sequence})
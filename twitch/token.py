@@ -2,6 +2,7 @@ import json
 from time import time
 
 from twitch.constants import Twitch
+from util.asynccontents import AsyncContents
 from util.contents import Contents
 from util.persistent_resource import PersistentJsonResource
 
@@ -17,15 +18,21 @@ class Token:
         if not self.__token_resource:
             token_file_name = self.__token_file_name.format(channel_name)
             self.__token_resource = PersistentJsonResource(token_file_name)
-        if not self.__token_resource.value() or \
-                self.__is_expired(self.__token_resource.value()):
-            self.__fetch_and_store_token(channel_name)
-        return self.__token_resource.value()
+        if self.__is_valid(self.__token_resource.value()):
+            return self.__token_resource.value()
+        with self.__token_resource.locked():
+            token = self.__token_resource.value()
+            if not self.__is_valid(token):
+                token = self.__fetch_and_store_token(channel_name)
+        return token
 
     @classmethod
-    def __is_expired(cls, token):
-        token_expiration_ms = json.loads(token['token'])['expires']
-        return token_expiration_ms - cls.__expiration_buffer_seconds < time()
+    def __is_valid(cls, token):
+        return token is not None and cls.__expires_at(token) >= time()
+
+    @classmethod
+    def __expires_at(cls, token):
+        return json.loads(token['token'])['expires'] - cls.__expiration_buffer_seconds
 
     @staticmethod
     def __fetch(link):
@@ -38,8 +45,16 @@ class Token:
     def __fetch_and_store_token(self, channel_name):
         token = self.__fetch(Twitch.channel_token_link.format(channel_name))
         if token:
-            self.__token_resource.store(token)
+            self.__token_resource.store(token, expires_at=self.__expires_at(token))
+        return token
 
     @classmethod
     def fetch_for_vod(cls, vod_id):
         return cls.__fetch(Twitch.vod_token_link.format(vod_id))
+
+    @staticmethod
+    async def fetch_for_vod_async(vod_id):
+        return await AsyncContents().json(
+            Twitch.vod_token_link.format(vod_id),
+            headers=Twitch.client_id_header
+        )
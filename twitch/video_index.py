@@ -0,0 +1,75 @@
+import json
+import os
+import sqlite3
+
+from util.file import File
+
+
+# a local copy of a channel's video list, newest first like Helix returns it,
+# which only needs the videos published since the last refresh
+class VideoIndex:
+    __schema = '''
+        CREATE TABLE IF NOT EXISTS videos (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS videos_by_user ON videos (user_id, created_at);
+    '''
+
+    def __init__(self, user_id):
+        self.__user_id = str(user_id)
+        database_file_name = f'{File.user_cache_dir()}/twitch-dl/videos.sqlite'
+        os.makedirs(os.path.dirname(database_file_name), exist_ok=True)
+        self.__connection = sqlite3.connect(database_file_name)
+        # sqlite's own lower() only folds ASCII letters
+        self.__connection.create_function('py_lower', 1, self.__lower, deterministic=True)
+        self.__connection.executescript(self.__schema)
+
+    def refresh(self, videos_newest_first):
+        new_videos = []
+        for video in videos_newest_first:
+            if self.__contains(video['id']):
+                break
+            new_videos.append(video)
+        with self.__connection:
+            self.__connection.executemany(
+                'INSERT OR REPLACE INTO videos (id, user_id, created_at, data) VALUES (?, ?, ?, ?)',
+                [(v['id'], self.__user_id, v['created_at'], json.dumps(v)) for v in new_videos]
+            )
+        return len(new_videos)
+
+    def rebuild(self, videos_newest_first):
+        with self.__connection:
+            self.__connection.execute('DELETE FROM videos WHERE user_id = ?', (self.__user_id,))
+        return self.refresh(videos_newest_first)
+
+    def __contains(self, video_id):
+        return self.__connection.execute(
+            'SELECT 1 FROM videos WHERE id = ?', (video_id,)
+        ).fetchone() is not None
+
+    def search(self, token, attribute_names):
+        matches = ' OR '.join(
+            ["instr(py_lower(json_extract(data, ?)), ?) > 0"] * len(attribute_names)
+        )
+        parameters = []
+        for attribute_name in attribute_names:
+            parameters += [self.__json_path(attribute_name), token]
+        rows = self.__connection.execute(
+            f'SELECT data FROM videos WHERE user_id = ? AND ({matches}) ORDER BY created_at DESC',
+            [self.__user_id] + parameters
+        )
+        return [json.loads(data) for data, in rows]
+
+    @staticmethod
+    def __lower(value):
+        return None if value is None else str(value).lower()
+
+    @staticmethod
+    def __json_path(attribute_name):
+        return '$."{}"'.format(attribute_name.replace('"', ''))
+
+    def close(self):
+        self.__connection.close()
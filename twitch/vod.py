@@ -1,13 +1,7 @@
-from twitch.constants import Twitch
-from util.auth_header_provider import AuthHeaderProvider
-from util.contents import Contents
+from twitch.helix import Helix
 
 
 class Vod:
     @staticmethod
-    def title(vod_id):
-        return Contents.json(
-            Twitch.videos_url,
-            params={'id': vod_id},
-            headers=AuthHeaderProvider.authenticate(),
-        )['data'][0]['title']
+    def titles(vod_ids):
+        return [video['title'] if video else None for _, video in Helix.videos_by_id(vod_ids)]
@@ -1,8 +1,13 @@
 import asyncio
 
 from twitch.progressbar import ProgressBar
-from util.asynccontents import AsyncContents, ResponseError
-from util.log import Log
+from twitch.reassembly_buffer import ReassemblyBuffer
+from util.async_file_writer import AsyncFileWriter
+from util.asynccontents import AsyncContents
+from util.file import File
+from util.metrics import Metrics
+from util.retry import NO_RETRY, RetryBudget
+from util.stopwatch import Stopwatch
 
 
 class StoppedException(Exception):
@@ -10,82 +15,118 @@ class StoppedException(Exception):
 
 
 class VodDownloader:
-    BATCH_SIZE = 8
+    RETRY_BUDGET = 100
+    MEMORY_BUDGET = 64 * 1024 * 1024  # 64MB
+    WRITE_QUEUE_SIZE = 4
 
-    def __init__(self, segments):
+    def __init__(self, segments, journal, concurrency, download_slots=None, shared_terminal=False):
         self.segments = segments
+        self.journal = journal
+        self.concurrency = concurrency
+        self.download_slots = download_slots or asyncio.Semaphore(concurrency.max_limit())
+        self.retry_policy = AsyncContents().retry_policy().with_budget(RetryBudget(self.RETRY_BUDGET))
         self.stopped = False
+        self.file_name = None
+        self.in_flight = 0
+        self.shared_terminal = shared_terminal
 
     async def download_to(self, file_name):
-        progress_bar = ProgressBar(file_name, len(self.segments))
+        self.file_name = file_name
+        progress_bar = ProgressBar(file_name, len(self.segments), lambda: self.in_flight, self.shared_terminal)
+        progress_bar.skip(self.journal.committed_segments(), self.journal.committed_size())
+        File.truncate(file_name, self.journal.committed_size())
         try:
             async with AsyncContents():
                 await self.download_file(file_name, progress_bar)
-        except Exception as e:
-            Log.fatal('\n' + str(e))
+        finally:
+            self.journal.flush()
+        if not self.stopped:
+            self.journal.finish()
 
     async def download_file(self, file_name, progress_bar):
-        last_offset = 0
-        for batch in self.chunks_of_size(self.segments, self.BATCH_SIZE):
-            if self.stopped:
+        pending = iter(enumerate(self.segments[self.journal.committed_segments():]))
+        offset = self.journal.committed_size()
+        async with AsyncFileWriter(file_name, offset, self.WRITE_QUEUE_SIZE) as writer:
+            buffer = ReassemblyBuffer(
+                writer,
+                self.MEMORY_BUDGET,
+                lambda size: self.segment_written(size, progress_bar)
+            )
+            workers = [
+                self.download_segments(pending, buffer)
+                for _ in range(self.concurrency.max_limit())
+            ]
+            await self.wait_for(workers)
+
+    # every worker takes the next segment and downloads it as soon as the controller grants
+    # it a slot, so a slow segment only occupies its own slot instead of stalling a whole batch
+    async def download_segments(self, pending, buffer):
+        while not self.stopped:
+            next_segment = next(pending, None)
+            if next_segment is None:
                 return
-            segments_with_offsets, new_offset = await self.get_segment_offsets(batch, last_offset)
-            last_offset = new_offset
-            download_jobs = []
-            for segment, offset in segments_with_offsets:
-                download_jobs.append(self.fetch_segment_and_write(segment, offset, file_name, progress_bar))
-            await self.wait_for(download_jobs)
+            index, segment = next_segment
+            # reserved before taking a slot, a slot idling on the memory budget
+            # would count against the throughput the controller measures
+            await buffer.reserve(index)
+            async with self.concurrency:
+                async with self.download_slots:
+                    self.in_flight += 1
+                    try:
+                        data = await self.retry_policy.call_async(lambda: self.fetch_segment_reporting(segment))
+                    finally:
+                        self.in_flight -= 1
+            await buffer.commit(index, data)
 
-    @staticmethod
-    def chunks_of_size(segments, batch_size):
-        return [segments[i:i + batch_size] for i in range(0, len(segments), batch_size)]
+    def segment_written(self, size, progress_bar):
+        self.journal.commit(1, size)
+        progress_bar.update_by(1, size)
+        Metrics().gauge('vod_segments_written', self.journal.committed_segments(), file=self.file_name)
+        Metrics().gauge('vod_segments', len(self.segments), file=self.file_name)
 
     @staticmethod
     async def wait_for(download_jobs):
-        done, pending = await asyncio.wait(download_jobs, return_when=asyncio.FIRST_EXCEPTION)
+        jobs = [asyncio.ensure_future(job) for job in download_jobs]
+        done, pending = await asyncio.wait(jobs, return_when=asyncio.FIRST_EXCEPTION)
         for job in pending:
             job.cancel()
         exception = None
         for job in done:
-            exception = job.exception()
+            exception = job.exception() or exception
         if exception is not None:
             raise exception
 
-    async def fetch_segment_and_write(self, segment, offset, file_name, progress_bar):
-        chunks = await AsyncContents().chunked(segment)
-        with open(file_name, 'rb+') as file:
-            file.seek(offset)
-            async for chunk in chunks:
-                if self.stopped:
-                    raise StoppedException('Stopped')
-                file.write(chunk)
-        progress_bar.update_by(1)
-
-    @classmethod
-    async def get_segment_offsets(cls, batch, initial_offset):
-        segment_sizes = await asyncio.gather(*[cls.get_segment_size(segment) for segment in batch])
-        segment_offsets = cls.build_offsets(segment_sizes, initial_offset)
-        return zip(batch, segment_offsets), initial_offset + sum(segment_sizes)
+    async def fetch_segment_reporting(self, segment):
+        stopwatch = Stopwatch()
+        try:
+            data = await self.fetch_segment(segment)
+        except StoppedException:
+            raise
+        except Exception as e:
+            self.concurrency.on_error()
+            Metrics().count('segment_errors_total', source='vod')
+            Metrics().event('segment_error', source='vod', file=self.file_name, uri=segment, error=str(e))
+            raise
+        seconds = stopwatch.split()
+        self.concurrency.on_success(len(data), seconds)
+        self.report_segment(segment, len(data), seconds)
+        return data
 
-    @classmethod
-    async def get_segment_size(cls, segment):
-        while True:
-            try:
-                headers = await AsyncContents().headers(segment)
-                return int(headers['Content-Length'])
-            except ResponseError as e:
-                # sometimes HEAD request randomly fail with 'Bad Request'
-                # just retry in such case
-                if e.status_code == 400 and e.status_message == 'Bad Request':
-                    continue
-                else:
-                    raise e
+    def report_segment(self, segment, size, seconds):
+        Metrics().count('segments_total', source='vod')
+        Metrics().count('segment_bytes_total', size, source='vod')
+        Metrics().observe('segment_seconds', seconds, source='vod')
+        Metrics().gauge('concurrency_limit', self.concurrency.limit(), file=self.file_name)
+        Metrics().event('segment', source='vod', file=self.file_name, uri=segment,
+                        bytes=size, seconds=round(seconds, 4), concurrency=self.concurrency.limit())
 
-    @staticmethod
-    def build_offsets(segment_sizes, initial_offset):
-        for size in segment_sizes:
-            yield initial_offset
-            initial_offset += size
+    async def fetch_segment(self, segment):
+        data = bytearray()
+        async for chunk in await AsyncContents().chunked(segment, retry_policy=NO_RETRY):
+            if self.stopped:
+                raise StoppedException('Stopped')
+            data += chunk
+        return data
 
     def stop(self):
         self.stopped = True
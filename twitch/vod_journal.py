@@ -0,0 +1,70 @@
+import os
+from time import time
+
+from util.file import File
+from util.persistent_resource import PersistentJsonResource
+
+
+class VodJournal:
+    __journal_file_name = '{}/twitch-dl/vod-{}-{}-{}.json'
+    # commits are stored at most this often, a crash only costs
+    # the segments committed since then, which a resume downloads again
+    __store_interval_seconds = 2
+
+    def __init__(self, vod_id, start_time, end_time):
+        self.__journal_resource = PersistentJsonResource(
+            self.__journal_file_name.format(File.user_cache_dir(), vod_id, start_time, end_time)
+        )
+        self.__journal = None
+        self.__stored_at = None
+
+    # the journal is shared by every directory, so only a download
+    # started in the current one is resumed
+    def resumable_file_name(self, segment_count):
+        journal = self.__journal_resource.value()
+        if not journal or journal['segment_count'] != segment_count:
+            return None
+        file_name = journal['file_name']
+        if os.path.dirname(file_name) != os.getcwd():
+            return None
+        if not File.isfile(file_name) or File.size(file_name) < journal['size']:
+            return None
+        return os.path.basename(file_name)
+
+    def start(self, file_name, segment_count):
+        self.__journal = {
+            'file_name': os.path.abspath(file_name),
+            'segment_count': segment_count,
+            'segments': 0,
+            'size': 0,
+        }
+        self.flush()
+
+    def committed_segments(self):
+        return self.__current()['segments']
+
+    def committed_size(self):
+        return self.__current()['size']
+
+    def __current(self):
+        if self.__journal is None:
+            self.__journal = dict(self.__journal_resource.value())
+            self.__stored_at = time()
+        return self.__journal
+
+    def commit(self, segments, size):
+        journal = self.__current()
+        journal['segments'] += segments
+        journal['size'] += size
+        if time() - self.__stored_at >= self.__store_interval_seconds:
+            self.flush()
+
+    def flush(self):
+        if self.__journal is None:
+            return
+        self.__journal_resource.store(dict(self.__journal))
+        self.__stored_at = time()
+
+    def finish(self):
+        self.__journal = None
+        self.__journal_resource.clear()
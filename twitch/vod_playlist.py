@@ -0,0 +1,97 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+
+
+# a VOD playlist kept as flat arrays, which stays small and
+# fast to search even for day long broadcasts with tens of thousands of segments
+class VodPlaylist:
+    __extinf = '#EXTINF:'
+    __muted_suffix = 'muted.ts'
+
+    def __init__(self, base_path, uris, durations):
+        self.base_path = base_path
+        self.__uris = uris
+        self.__durations = durations
+        self.__starts = array('d')
+        self.__ends = array('d')
+        self.__muted = bytearray(len(uris))
+        end = 0.0
+        for index, (uri, duration) in enumerate(zip(uris, durations)):
+            self.__starts.append(end)
+            end += duration
+            self.__ends.append(end)
+            self.__muted[index] = uri.endswith(self.__muted_suffix)
+
+    @classmethod
+    def parse(cls, raw_playlist, base_path):
+        uris = []
+        durations = array('d')
+        duration = None
+        for line in raw_playlist.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if line[0] != '#':
+                if duration is not None:
+                    uris.append(cls.__relative_to(base_path, line))
+                    durations.append(duration)
+                    duration = None
+            elif line.startswith(cls.__extinf):
+                duration = float(line[len(cls.__extinf):].partition(',')[0])
+        return cls(base_path, uris, durations)
+
+    @staticmethod
+    def __relative_to(base_path, uri):
+        prefix = base_path + '/'
+        return uri[len(prefix):] if uri.startswith(prefix) else uri
+
+    def __len__(self):
+        return len(self.__uris)
+
+    def start(self, index):
+        return self.__starts[index]
+
+    def duration(self, index):
+        return self.__durations[index]
+
+    def is_muted(self, index):
+        return bool(self.__muted[index])
+
+    def muted_ranges(self):
+        ranges = []
+        for index in range(len(self)):
+            if not self.__muted[index]:
+                continue
+            if ranges and ranges[-1][1] == self.__starts[index]:
+                ranges[-1] = (ranges[-1][0], self.__ends[index])
+            else:
+                ranges.append((self.__starts[index], self.__ends[index]))
+        return ranges
+
+    def uri(self, index):
+        uri = self.__uris[index]
+        return uri if '://' in uri else self.base_path + '/' + uri
+
+    # same clipping as before: every segment overlapping the time range
+    def indices_between(self, start_time, end_time):
+        first = bisect_right(self.__ends, start_time)
+        last = bisect_left(self.__starts, end_time)
+        return range(first, max(first, last))
+
+    def uris_between(self, start_time, end_time):
+        return SegmentUris(self, self.indices_between(start_time, end_time))
+
+
+class SegmentUris(Sequence):
+    def __init__(self, playlist, indices):
+        self.__playlist = playlist
+        self.__indices = indices
+
+    def __len__(self):
+        return len(self.__indices)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return SegmentUris(self.__playlist, self.__indices[item])
+        return self.__playlist.uri(self.__indices[item])
@@ -0,0 +1,67 @@
+import asyncio
+import os
+
+
+class AsyncFileWriter:
+    def __init__(self, file_name, offset, queue_size):
+        self.__file_name = file_name
+        self.__offset = offset
+        self.__queue = asyncio.Queue(maxsize=queue_size)
+        self.__fd = None
+        self.__writer = None
+        self.__error = None
+        self.__discarding = False
+
+    async def __aenter__(self):
+        self.__fd = os.open(self.__file_name, os.O_WRONLY | os.O_CREAT, 0o644)
+        self.__writer = asyncio.ensure_future(self.__write_queued())
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if exc_type is not None:
+                # queued writes are dropped, but a write already running
+                # in the executor has to finish before its file is closed
+                self.__discarding = True
+            await self.__queue.put(None)
+            await self.__writer
+            if exc_type is None:
+                self.__raise_if_failed()
+        finally:
+            os.close(self.__fd)
+
+    # blocks while the queue is full, which slows the producers down
+    # to the pace of the disk instead of piling data up in memory
+    async def write(self, data, on_written=None):
+        self.__raise_if_failed()
+        offset = self.__offset
+        self.__offset += len(data)
+        await self.__queue.put((data, offset, on_written))
+
+    def __raise_if_failed(self):
+        if self.__error is not None:
+            raise self.__error
+
+    async def __write_queued(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            item = await self.__queue.get()
+            if item is None:
+                return
+            if self.__error is not None or self.__discarding:
+                continue
+            data, offset, on_written = item
+            try:
+                await loop.run_in_executor(None, self.__pwrite, data, offset)
+                if on_written:
+                    on_written(len(data))
+            except Exception as e:
+                # kept for the producers, the writer itself has to go on draining the queue
+                self.__error = e
+
+    def __pwrite(self, data, offset):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(self.__fd, view, offset)
+            view = view[written:]
+            offset += written
@@ -1,21 +1,23 @@
 import asyncio
 from http import HTTPStatus
 
-from aiohttp import ClientSession, ClientResponseError
+from aiohttp import ClientSession, ClientResponseError, ClientConnectionError, ClientPayloadError, \
+    ClientTimeout, TCPConnector, TraceConfig
 from aiohttp.hdrs import METH_GET, METH_HEAD
 
+from util.contents import ContentError
+from util.metrics import Metrics
+from util.retry import RETRYABLE_STATUSES, RetryPolicy, retry_after_seconds
 from util.singleton import Singleton
 
 
-class ContentError(Exception):
-    pass
-
-
 class ResponseError(ContentError):
     def __init__(self, response):
         super().__init__(self._build_error_message(response))
+        self.method = response.method
         self.status_code = response.status
         self.status_message = response.reason
+        self.retry_after = retry_after_seconds(response.headers)
 
     @staticmethod
     def _build_error_message(response):
@@ -30,38 +32,132 @@ class ResponseError(ContentError):
 class AsyncContents(metaclass=Singleton):
     _MAX_CHUNK_SIZE = 2 * 1024 * 1024  # 2MB
     _session: ClientSession = None
-
+    _retry_policy: RetryPolicy = None
+    _connections = 100
+    _connections_per_host = 0  # unlimited
+    _dns_cache_seconds = 300
+    _connect_timeout = 10
+    _read_timeout = 60
+    _connections_created = 0
+    _connections_reused = 0
+    _users = 0
+
+    def configure(self, connections=None, connections_per_host=None, dns_cache_seconds=None,
+                  connect_timeout=None, read_timeout=None):
+        assert self._session is None, 'configure before entering'
+        if connections is not None:
+            self._connections = connections
+        if connections_per_host is not None:
+            self._connections_per_host = connections_per_host
+        if dns_cache_seconds is not None:
+            self._dns_cache_seconds = dns_cache_seconds
+        if connect_timeout is not None:
+            self._connect_timeout = connect_timeout
+        if read_timeout is not None:
+            self._read_timeout = read_timeout
+
+    # several recorders may share the session, the last one to leave closes it
     async def __aenter__(self):
+        self._users += 1
         if self._session is None:
-            self._session = ClientSession()
+            self._session = ClientSession(
+                connector=TCPConnector(
+                    limit=self._connections,
+                    limit_per_host=self._connections_per_host,
+                    ttl_dns_cache=self._dns_cache_seconds,
+                ),
+                timeout=ClientTimeout(
+                    total=None,
+                    connect=self._connect_timeout,
+                    sock_read=self._read_timeout,
+                ),
+                trace_configs=[self.__connection_tracing()],
+            )
             return await self._session.__aenter__()
 
+    def __connection_tracing(self):
+        async def on_created(session, context, params):
+            self._connections_created += 1
+
+        async def on_reused(session, context, params):
+            self._connections_reused += 1
+
+        async def on_request_start(session, context, params):
+            context.started_at = asyncio.get_event_loop().time()
+
+        # the request ends once the response headers arrived, which makes this the time to first byte
+        async def on_request_end(session, context, params):
+            seconds = asyncio.get_event_loop().time() - context.started_at
+            host = params.url.host
+            Metrics().count('requests_total', method=params.method, host=host, status=params.response.status)
+            Metrics().observe('request_ttfb_seconds', seconds, host=host)
+            Metrics().event('request', method=params.method, url=str(params.url),
+                            status=params.response.status, ttfb=round(seconds, 4))
+
+        async def on_request_exception(session, context, params):
+            error = type(params.exception).__name__
+            Metrics().count('request_errors_total', host=params.url.host, error=error)
+            Metrics().event('request_error', method=params.method, url=str(params.url), error=error)
+
+        trace_config = TraceConfig()
+        trace_config.on_connection_create_end.append(on_created)
+        trace_config.on_connection_reuseconn.append(on_reused)
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        return trace_config
+
+    def connection_stats(self):
+        return self._connections_created, self._connections_reused
+
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         assert self._session is not None, 'this object was not entered'
-        await self._session.__aexit__(exc_type, exc_val, exc_tb)
-        self._session = None
+        self._users -= 1
+        if self._users == 0:
+            await self._session.__aexit__(exc_type, exc_val, exc_tb)
+            self._session = None
 
     def __await__(self):
         return []
 
-    async def utf8(self, resource, params=None, headers=None):
+    def retry_policy(self):
+        if self._retry_policy is None:
+            self._retry_policy = RetryPolicy(self.is_retryable, on_retry=self.__on_retry)
+        return self._retry_policy
+
+    @staticmethod
+    def __on_retry(error, attempt, delay):
+        Metrics().count('retries_total', error=type(error).__name__)
+        Metrics().event('retry', error=str(error), attempt=attempt + 1, delay=round(delay, 3))
+
+    async def utf8(self, resource, params=None, headers=None, retry_policy=None):
         response = await self.__raw(
             resource,
             params=params,
             headers=headers,
+            retry_policy=retry_policy,
         )
         return response.decode('utf-8')
 
-    async def __raw(self, resource, params=None, headers=None):
+    async def __raw(self, resource, params=None, headers=None, retry_policy=None):
+        return await (retry_policy or self.retry_policy()).call_async(
+            lambda: self.__read(resource, params=params, headers=headers)
+        )
+
+    async def __read(self, resource, params=None, headers=None):
         response = await self.__get_ok(
             resource,
             params=params,
             headers=headers,
         )
-        raw_content = response.content.read()
-        return await raw_content
+        return await response.content.read()
 
-    async def json(self, resource, params=None, headers=None):
+    async def json(self, resource, params=None, headers=None, retry_policy=None):
+        return await (retry_policy or self.retry_policy()).call_async(
+            lambda: self.__read_json(resource, params=params, headers=headers)
+        )
+
+    async def __read_json(self, resource, params=None, headers=None):
         response = await self.__get_ok(
             resource,
             params=params,
@@ -78,49 +174,46 @@ class AsyncContents(metaclass=Singleton):
         )
         return self.__check_ok(response)
 
-    async def headers(self, resource):
-        response = await self.__get_ok(
-            resource,
-            method=METH_HEAD,
+    async def headers(self, resource, retry_policy=None):
+        response = await (retry_policy or self.retry_policy()).call_async(
+            lambda: self.__get_ok(resource, method=METH_HEAD)
         )
-        return self.__check_ok(response).headers
+        return response.headers
 
     async def __get(self, resource, method=METH_GET, params=None, headers=None):
-        while True:
-            try:
-                await self.try_avoiding_connection_errors()
-                return await self._session.request(
-                    method,
-                    resource,
-                    params=params,
-                    headers=headers,
-                    chunked=True,
-                    allow_redirects=True,
-                    timeout=60,
-                )
-            except ClientResponseError as e:
-                # occurs randomly, just retry
-                # https://github.com/aio-libs/aiohttp/issues/2624
-                if e.status == 400 and e.message == 'invalid constant string':
-                    continue
-                raise e
-
-    '''
-        try avoiding ClientOsError('cannot write to closing transport') and
-        Unclosed connection client_connection: Connection<ConnectionKey(...)>
-        by sleeping
-        https://github.com/aio-libs/aiohttp/issues/1799
-    '''
+        return await self._session.request(
+            method,
+            resource,
+            params=params,
+            headers=headers,
+            allow_redirects=True,
+        )
+
     @staticmethod
-    async def try_avoiding_connection_errors():
-        await asyncio.sleep(0.001)
+    def is_retryable(error):
+        if isinstance(error, ResponseError):
+            # HEAD requests get a 400 now and then, just retry
+            if error.method == METH_HEAD and error.status_code == HTTPStatus.BAD_REQUEST:
+                return True
+            return error.status_code in RETRYABLE_STATUSES
+        if isinstance(error, ClientResponseError):
+            # occurs randomly, just retry
+            # https://github.com/aio-libs/aiohttp/issues/2624
+            return error.status == 400 and error.message == 'invalid constant string'
+        # includes ClientOSError('cannot write to closing transport')
+        # raised when a pooled connection was closed by the server
+        # https://github.com/aio-libs/aiohttp/issues/1799
+        return isinstance(error, (ClientConnectionError, ClientPayloadError, asyncio.TimeoutError))
 
     @staticmethod
     def __check_ok(response):
         if response.status != HTTPStatus.OK:
+            response.release()
             raise ResponseError(response)
         return response
 
-    async def chunked(self, resource):
-        response = await self.__get_ok(resource)
+    async def chunked(self, resource, retry_policy=None):
+        response = await (retry_policy or self.retry_policy()).call_async(
+            lambda: self.__get_ok(resource)
+        )
         return response.content.iter_chunked(self._MAX_CHUNK_SIZE)
@@ -1,24 +1,96 @@
 import os
+import threading
+from http import HTTPStatus
+from time import time
 
 from twitch.constants import Twitch
-from util.contents import Contents
-from util.log import Log
+from util.contents import ContentError, Contents
+from util.file import File
+from util.persistent_resource import PersistentJsonResource
 
 
 # Expecting the credentials file to be a text file with
 # client_id on the first line and client_secret on the second
 class AuthHeaderProvider:
+    __expiration_buffer_seconds = 60
+    __token_lock = threading.Lock()
+    __token = None
+    __resource = None
+
     @classmethod
     def authenticate(cls):
-        credentials_file = cls.build_credentials_file_path()
-        client_id, client_secret = cls.read_credentials(credentials_file)
-        token = Contents.post(
+        with cls.__token_lock:
+            token = cls.__token
+            if token is None or token['expires_at'] < time():
+                with cls.__token_resource().locked():
+                    token = cls.__cached_token() or cls.__fetch_token()
+            cls.__token = token
+        return {'Client-ID': token['client_id'], 'Authorization': 'Bearer ' + token['access_token']}
+
+    @classmethod
+    def invalidate(cls):
+        with cls.__token_lock:
+            cls.__token = None
+            cls.__token_resource().clear()
+
+    # Helix answers 401 once an app token got revoked or expired early,
+    # so such a call is retried once with a freshly minted token
+    @classmethod
+    def json(cls, resource, params=None, onerror=None):
+        unauthorized = object()
+
+        def failed(status_code):
+            if onerror is None:
+                raise ContentError('Failed to get {url}: got {statusCode} response'.format(
+                    url=resource,
+                    statusCode=status_code
+                ))
+            return onerror(status_code)
+
+        def failed_unless_unauthorized(status_code):
+            return unauthorized if status_code == HTTPStatus.UNAUTHORIZED else failed(status_code)
+
+        response = Contents.json(
+            resource,
+            params=params,
+            headers=cls.authenticate(),
+            onerror=failed_unless_unauthorized
+        )
+        if response is not unauthorized:
+            return response
+        cls.invalidate()
+        return Contents.json(resource, params=params, headers=cls.authenticate(), onerror=failed)
+
+    @classmethod
+    def __cached_token(cls):
+        token = cls.__token_resource().value()
+        if token is None or token['expires_at'] < time():
+            return None
+        client_id, _ = cls.read_credentials(cls.build_credentials_file_path())
+        return token if token['client_id'] == client_id else None
+
+    @classmethod
+    def __fetch_token(cls):
+        client_id, client_secret = cls.read_credentials(cls.build_credentials_file_path())
+        response = Contents.post(
             Twitch.auth_token_url.format(
                 client_id=client_id,
                 client_secret=client_secret
             )
-        ).json()['access_token']
-        return {'Client-ID': client_id, 'Authorization': 'Bearer ' + token}
+        ).json()
+        token = {
+            'client_id': client_id,
+            'access_token': response['access_token'],
+            'expires_at': time() + response['expires_in'] - cls.__expiration_buffer_seconds,
+        }
+        cls.__token_resource().store(token, expires_at=token['expires_at'])
+        return token
+
+    @classmethod
+    def __token_resource(cls):
+        if cls.__resource is None:
+            cls.__resource = PersistentJsonResource(f'{File.user_cache_dir()}/twitch-dl/app-access-token.json')
+        return cls.__resource
 
     @staticmethod
     def build_credentials_file_path():
@@ -36,4 +108,4 @@ class AuthHeaderProvider:
                     raise ValueError('empty credentials')
                 return client_id, client_secret
         except FileNotFoundError as e:
-            Log.fatal(str(e))
+            raise ValueError(str(e)) from e
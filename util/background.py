@@ -0,0 +1,7 @@
+import asyncio
+
+
+# blocking calls, e.g. Contents and the Helix lookups, run on the default executor
+# so they don't hold up the event loop
+async def in_background(function, *args):
+    return await asyncio.get_event_loop().run_in_executor(None, function, *args)
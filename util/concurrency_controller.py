@@ -0,0 +1,81 @@
+import asyncio
+
+from util.stopwatch import Stopwatch
+
+
+# AIMD: the limit grows by one slot while throughput keeps improving
+# and is cut multiplicatively on errors or when latency climbs without any gain
+class ConcurrencyController:
+    __error_decrease_factor = 0.5
+    __latency_decrease_factor = 0.75
+    __latency_tolerance = 2.0
+    __latency_smoothing = 0.2
+
+    def __init__(self, min_limit, max_limit):
+        self.__min_limit = min_limit
+        self.__max_limit = max_limit
+        self.__limit = min_limit
+        self.__active = 0
+        self.__changed = asyncio.Condition()
+        self.__stopwatch = Stopwatch()
+        self.__window_size = 0
+        self.__window_count = 0
+        self.__throughput = 0
+        self.__latency = None
+        self.__min_latency = None
+
+    def max_limit(self):
+        return self.__max_limit
+
+    def limit(self):
+        return self.__limit
+
+    async def __aenter__(self):
+        async with self.__changed:
+            await self.__changed.wait_for(lambda: self.__active < self.__limit)
+            self.__active += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        async with self.__changed:
+            self.__active -= 1
+            self.__changed.notify_all()
+
+    def on_success(self, size, seconds):
+        self.__window_size += size
+        self.__window_count += 1
+        self.__track_latency(seconds)
+        if self.__window_count >= self.__limit:
+            self.__adjust()
+
+    def on_error(self):
+        self.__decrease(self.__error_decrease_factor)
+        self.__throughput = 0
+        self.__start_window()
+
+    def __track_latency(self, seconds):
+        if self.__latency is None:
+            self.__latency = seconds
+        else:
+            self.__latency += self.__latency_smoothing * (seconds - self.__latency)
+        if self.__min_latency is None or seconds < self.__min_latency:
+            self.__min_latency = seconds
+
+    def __adjust(self):
+        throughput = self.__window_size / max(self.__stopwatch.split(), 1e-6)
+        latency_rising = self.__latency > self.__latency_tolerance * self.__min_latency
+        if throughput >= self.__throughput:
+            self.__limit = min(self.__limit + 1, self.__max_limit)
+        elif latency_rising:
+            self.__decrease(self.__latency_decrease_factor)
+        self.__throughput = throughput
+        self.__window_size = 0
+        self.__window_count = 0
+
+    def __decrease(self, factor):
+        self.__limit = max(int(self.__limit * factor), self.__min_limit)
+
+    def __start_window(self):
+        self.__stopwatch.split()
+        self.__window_size = 0
+        self.__window_count = 0
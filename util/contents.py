@@ -2,8 +2,10 @@ from collections import namedtuple
 
 import requests
 from requests import codes as status
+from requests import exceptions
+from requests.adapters import HTTPAdapter
 
-from util.log import Log
+from util.retry import RETRYABLE_STATUSES, RetryPolicy, retry_after_seconds
 
 Content = namedtuple('Content', 'decode')
 
@@ -16,7 +18,46 @@ class Error:
         self.iter_content = lambda chunk_size: value
 
 
+class ContentError(Exception):
+    pass
+
+
+class RetryableResponse(Exception):
+    def __init__(self, response):
+        super().__init__('got {} response'.format(response.status_code))
+        self.response = response
+        self.retry_after = retry_after_seconds(response.headers)
+
+
 class Contents:
+    _retry_policy = None
+    _session = None
+    _pool_connections = 10
+    _pool_maxsize = 10
+
+    @classmethod
+    def configure(cls, pool_connections=None, pool_maxsize=None):
+        assert cls._session is None, 'configure before the first request'
+        if pool_connections is not None:
+            cls._pool_connections = pool_connections
+        if pool_maxsize is not None:
+            cls._pool_maxsize = pool_maxsize
+
+    # one keep-alive session for the whole process, so polling the same hosts
+    # over and over does not pay for a new TCP and TLS handshake every time
+    @classmethod
+    def session(cls):
+        if cls._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=cls._pool_connections,
+                pool_maxsize=cls._pool_maxsize,
+            )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            cls._session = session
+        return cls._session
+
     @classmethod
     def utf8(cls, resource, params=None, headers=None, onerror=None):
         return cls.__raw(
@@ -53,34 +94,64 @@ class Contents:
 
     @classmethod
     def headers(cls, resource):
-        try:
-            return cls.__check_ok(requests.head(resource)).headers
-        except Exception as e:
-            Log.fatal(str(e))
+        return cls.__check_ok(cls.__request(cls.session().head, resource)).headers
 
-    @staticmethod
-    def __get(resource, params=None, headers=None):
+    @classmethod
+    def __get(cls, resource, params=None, headers=None):
+        return cls.__request(cls.session().get, resource, params=params, headers=headers)
+
+    @classmethod
+    def retry_policy(cls):
+        if cls._retry_policy is None:
+            cls._retry_policy = RetryPolicy(cls.is_retryable)
+        return cls._retry_policy
+
+    @classmethod
+    def __request(cls, method, resource, params=None, headers=None):
         try:
-            return requests.get(
-                resource,
-                params=params,
-                headers=headers,
-                stream=True
+            return cls.retry_policy().call(
+                lambda: cls.__send(method, resource, params=params, headers=headers)
             )
+        except RetryableResponse as e:
+            return e.response
         except Exception as e:
-            Log.fatal(str(e))
+            raise ContentError(str(e)) from e
+
+    @staticmethod
+    def __send(method, resource, params=None, headers=None):
+        response = method(
+            resource,
+            params=params,
+            headers=headers,
+            stream=True
+        )
+        if response.status_code in RETRYABLE_STATUSES:
+            response.close()
+            raise RetryableResponse(response)
+        return response
+
+    @staticmethod
+    def is_retryable(error):
+        return isinstance(error, (
+            RetryableResponse,
+            exceptions.ConnectionError,
+            exceptions.Timeout,
+            exceptions.ChunkedEncodingError,
+        ))
 
     @staticmethod
     def __check_ok(response, onerror=None):
         if response.status_code != status.ok:
             if onerror is None:
-                Log.fatal(
+                response.close()
+                raise ContentError(
                     'Failed to get {url}: got {statusCode} response'.format(
                         url=response.url,
                         statusCode=response.status_code
                     )
                 )
             else:
+                response.close()
                 return Error(onerror(response.status_code))
         return response
 
@@ -97,12 +168,4 @@ class Contents:
 
     @classmethod
     def __post(cls, resource, params, headers):
-        try:
-            return requests.post(
-                resource,
-                params=params,
-                headers=headers,
-                stream=True
-            )
-        except Exception as e:
-            Log.fatal(str(e))
+        return cls.__request(cls.session().post, resource, params=params, headers=headers)
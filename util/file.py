@@ -25,3 +25,11 @@ class File:
         if cache_dir:
             return cache_dir
         return os.path.expanduser('~/.cache')
+
+    @staticmethod
+    def size(file_name):
+        return os.path.getsize(file_name)
+
+    @staticmethod
+    def truncate(file_name, size):
+        os.truncate(file_name, size)
@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+import threading
+from collections import defaultdict
+from os import path
+from time import time
+
+from util.singleton import Singleton
+
+
+# Counters, gauges and summaries are kept in memory and can be exposed in the Prometheus text format.
+# Events are appended as JSON lines to the events file, if one is configured.
+class Metrics(metaclass=Singleton):
+    __prefix = 'twitch_dl_'
+    __write_interval_seconds = 10
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__types = {}
+        self.__values = defaultdict(float)
+        self.__events_file = None
+        self.__prometheus_file_name = None
+        self.__last_written = 0
+
+    def configure(self, events_file_name=None, prometheus_file_name=None):
+        if events_file_name:
+            self.__events_file = open(path.expanduser(events_file_name), 'a', buffering=1)
+        if prometheus_file_name:
+            self.__prometheus_file_name = path.expanduser(prometheus_file_name)
+
+    def count(self, name, value=1, **labels):
+        self.__update('counter', name, labels, value)
+
+    def gauge(self, name, value, **labels):
+        self.__update('gauge', name, labels, value, replace=True)
+
+    def observe(self, name, value, **labels):
+        with self.__lock:
+            self.__types[name] = 'summary'
+            key = self.__key(labels)
+            self.__values[(name + '_sum', key)] += value
+            self.__values[(name + '_count', key)] += 1
+        self.__write_prometheus_file_if_due()
+
+    def event(self, kind, **fields):
+        if self.__events_file is None:
+            return
+        fields = dict(fields, event=kind, time=round(time(), 3))
+        line = json.dumps(fields, separators=(',', ':'))
+        with self.__lock:
+            self.__events_file.write(line + '\n')
+
+    def __update(self, metric_type, name, labels, value, replace=False):
+        with self.__lock:
+            self.__types[name] = metric_type
+            if replace:
+                self.__values[(name, self.__key(labels))] = value
+            else:
+                self.__values[(name, self.__key(labels))] += value
+        self.__write_prometheus_file_if_due()
+
+    @staticmethod
+    def __key(labels):
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def prometheus_text(self):
+        with self.__lock:
+            values = sorted(self.__values.items())
+            types = dict(self.__types)
+        lines = []
+        for name in sorted(types):
+            lines.append(f'# TYPE {self.__prefix}{name} {types[name]}')
+            for (series, labels), value in values:
+                if series == name or types[name] == 'summary' and series in (name + '_sum', name + '_count'):
+                    lines.append(f'{self.__prefix}{series}{self.__labels_text(labels)} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def __labels_text(labels):
+        if not labels:
+            return ''
+        return '{' + ','.join(
+            '{}="{}"'.format(name, value.replace('\\', '\\\\').replace('"', '\\"'))
+            for name, value in labels
+        ) + '}'
+
+    def __write_prometheus_file_if_due(self):
+        if self.__prometheus_file_name and time() - self.__last_written >= self.__write_interval_seconds:
+            self.write_prometheus_file()
+
+    # scrapers like the node exporter's textfile collector must never see a half-written file
+    def write_prometheus_file(self):
+        if self.__prometheus_file_name is None:
+            return
+        self.__last_written = time()
+        directory = path.dirname(self.__prometheus_file_name) or '.'
+        file_descriptor, temporary_file_name = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'w') as prometheus_file:
+            prometheus_file.write(self.prometheus_text())
+        os.chmod(temporary_file_name, 0o644)
+        os.replace(temporary_file_name, self.__prometheus_file_name)
+
+    def close(self):
+        self.write_prometheus_file()
+        if self.__events_file is not None:
+            self.__events_file.close()
+            self.__events_file = None
@@ -1,29 +1,119 @@
+import fcntl
 import json
 import os
+import tempfile
+import threading
+from contextlib import contextmanager
 from os import path
+from time import time
 
 
+# Values are kept in memory and only read again once another process replaced the file.
+# The file holds the value along with when it was stored and when it expires.
 class PersistentJsonResource:
-    def __init__(self, file_name):
+    def __init__(self, file_name, max_age_seconds=None):
         self.__file_name = path.expanduser(file_name)
-        self.__value = None
+        self.__max_age_seconds = max_age_seconds
+        self.__thread_lock = threading.RLock()
+        self.__entry = None
+        self.__file_version = None
+        self.__lock_file = None
+        self.__lock_depth = 0
 
     def value(self):
-        if self.__value:
-            return self.__value
-        if path.isfile(self.__file_name):
-            with open(self.__file_name, 'r') as resource_file:
-                return json.load(resource_file)
-        return None
+        entry = self.__current_entry()
+        if entry is None or self.__is_expired(entry):
+            return None
+        return entry['value']
+
+    def expires_at(self):
+        entry = self.__current_entry()
+        return entry['expires_at'] if entry else None
+
+    def stored_at(self):
+        entry = self.__current_entry()
+        return entry['stored_at'] if entry else None
 
-    def store(self, value):
-        if value:
-            self.__value = value
-            os.makedirs(path.dirname(self.__file_name), exist_ok=True)
-            with open(self.__file_name, 'w') as resource_file:
-                json.dump(value, resource_file)
+    def store(self, value, expires_at=None):
+        if not value:
+            return
+        stored_at = time()
+        if expires_at is None and self.__max_age_seconds is not None:
+            expires_at = stored_at + self.__max_age_seconds
+        entry = {'stored_at': stored_at, 'expires_at': expires_at, 'value': value}
+        with self.locked():
+            self.__write(entry)
+            self.__entry = entry
+            self.__file_version = self.__version_of_file()
 
     def clear(self):
-        self.__value = None
-        if path.isfile(self.__file_name):
-            os.remove(self.__file_name)
+        with self.locked():
+            self.__entry = None
+            self.__file_version = None
+            if path.isfile(self.__file_name):
+                os.remove(self.__file_name)
+
+    # held across a check-fetch-store sequence so concurrent processes
+    # wait for the first one's result instead of fetching the same value again
+    # re-entering from the same thread only counts, flock would wait for itself
+    # since every open of the lock file gets its own lock
+    @contextmanager
+    def locked(self):
+        with self.__thread_lock:
+            if self.__lock_file is None:
+                os.makedirs(path.dirname(self.__file_name), exist_ok=True)
+                self.__lock_file = open(self.__file_name + '.lock', 'a')
+                fcntl.flock(self.__lock_file, fcntl.LOCK_EX)
+            self.__lock_depth += 1
+            try:
+                yield
+            finally:
+                self.__lock_depth -= 1
+                if self.__lock_depth == 0:
+                    fcntl.flock(self.__lock_file, fcntl.LOCK_UN)
+                    self.__lock_file.close()
+                    self.__lock_file = None
+
+    def __current_entry(self):
+        with self.__thread_lock:
+            version = self.__version_of_file()
+            if version != self.__file_version:
+                self.__entry = self.__read() if version else None
+                self.__file_version = version
+            return self.__entry
+
+    def __version_of_file(self):
+        try:
+            stat = os.stat(self.__file_name)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def __read(self):
+        try:
+            with open(self.__file_name, 'r') as resource_file:
+                content = json.load(resource_file)
+        except (FileNotFoundError, ValueError):
+            return None
+        if isinstance(content, dict) and content.keys() == {'stored_at', 'expires_at', 'value'}:
+            return content
+        # written before expiry metadata existed
+        stored_at = path.getmtime(self.__file_name)
+        expires_at = stored_at + self.__max_age_seconds if self.__max_age_seconds is not None else None
+        return {'stored_at': stored_at, 'expires_at': expires_at, 'value': content}
+
+    # a crash mid-write leaves the previous file intact
+    def __write(self, entry):
+        directory = path.dirname(self.__file_name)
+        file_descriptor, temporary_file_name = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'w') as resource_file:
+                json.dump(entry, resource_file)
+            os.replace(temporary_file_name, self.__file_name)
+        except BaseException:
+            os.remove(temporary_file_name)
+            raise
+
+    @staticmethod
+    def __is_expired(entry):
+        return entry['expires_at'] is not None and entry['expires_at'] < time()
@@ -0,0 +1,112 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+def retry_after_seconds(headers):
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+# shared by every request of one job, so a job hitting
+# a broken CDN gives up instead of retrying each request to the limit.
+# A job without an end, like a live recording, gets a retry back every refill_seconds
+class RetryBudget:
+    def __init__(self, retries, refill_seconds=None):
+        self.__retries = retries
+        self.__remaining = retries
+        self.__refill_seconds = refill_seconds
+        self.__refilled_at = time.monotonic()
+
+    def try_spend(self):
+        self.__refill()
+        if self.__remaining <= 0:
+            return False
+        self.__remaining -= 1
+        return True
+
+    def __refill(self):
+        if self.__refill_seconds is None:
+            return
+        refills = int((time.monotonic() - self.__refilled_at) / self.__refill_seconds)
+        if refills != 0:
+            self.__remaining = min(self.__remaining + refills, self.__retries)
+            self.__refilled_at += refills * self.__refill_seconds
+
+
+class RetryPolicy:
+    def __init__(self, is_retryable, attempts=5, base_delay=0.5, max_delay=30.0, budget=None, on_retry=None):
+        self.__is_retryable = is_retryable
+        self.__attempts = attempts
+        self.__base_delay = base_delay
+        self.__max_delay = max_delay
+        self.__budget = budget
+        self.__on_retry = on_retry
+
+    def with_budget(self, budget):
+        return RetryPolicy(
+            self.__is_retryable,
+            attempts=self.__attempts,
+            base_delay=self.__base_delay,
+            max_delay=self.__max_delay,
+            budget=budget,
+            on_retry=self.__on_retry,
+        )
+
+    def call(self, action):
+        attempt = 0
+        while True:
+            try:
+                return action()
+            except Exception as e:
+                delay = self.__delay_before_retrying(attempt, e)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    async def call_async(self, action):
+        attempt = 0
+        while True:
+            try:
+                return await action()
+            except Exception as e:
+                delay = self.__delay_before_retrying(attempt, e)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def __delay_before_retrying(self, attempt, error):
+        if attempt + 1 >= self.__attempts or not self.__is_retryable(error):
+            return None
+        retry_after = getattr(error, 'retry_after', None)
+        # waiting longer than max_delay would hold on to a download slot for nothing
+        if retry_after is not None and retry_after > self.__max_delay:
+            return None
+        if self.__budget is not None and not self.__budget.try_spend():
+            return None
+        # full jitter keeps many failed requests from retrying in lockstep
+        delay = random.uniform(0, min(self.__max_delay, self.__base_delay * 2 ** attempt))
+        delay = delay if retry_after is None else max(delay, retry_after)
+        if self.__on_retry is not None:
+            self.__on_retry(error, attempt, delay)
+        return delay
+
+
+# for requests made within an action that is itself retried as a whole
+NO_RETRY = RetryPolicy(lambda error: False, attempts=1)